@@ -0,0 +1,127 @@
+import os
+import mmap
+import hashlib
+import mimetypes
+import threading
+from email.message import MIMEPart
+
+
+class Attachment:
+    """One file attached to a batch, stat'ed and hashed once however many messages carry it"""
+
+    __slots__ = ('path', 'filename', 'size', 'mtime_ns', 'digest', 'maintype', 'subtype', '_part')
+
+    def __init__(self, path, size, mtime_ns, digest):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        ctype, encoding = mimetypes.guess_type(path)
+        if ctype is None or encoding is not None:
+            ctype = 'application/octet-stream'
+        self.maintype, self.subtype = ctype.split('/', 1)
+        self._part = None
+
+    def mime_part(self):
+        """The attachment as a MIME part, encoded once and reused for every message.
+
+        The file is memory-mapped for encoding, so its bytes are never copied into a Python
+        object; only the base64 text is kept, until the last message carrying it is done.
+        """
+        if self._part is None:
+            part = MIMEPart()
+            with open(self.path, 'rb') as f:
+                if self.size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                        part.set_content(view, maintype=self.maintype, subtype=self.subtype,
+                                         disposition='attachment', filename=self.filename)
+                else:
+                    part.set_content(b"", maintype=self.maintype, subtype=self.subtype,
+                                     disposition='attachment', filename=self.filename)
+            self._part = part
+        return self._part
+
+    def release(self):
+        self._part = None
+
+
+def _file_digest(path, size):
+    with open(path, 'rb') as f:
+        if not size:
+            return hashlib.sha1(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha1(mm).hexdigest()
+
+
+class AttachmentSet:
+    """Attachments of one send batch, keyed by path.
+
+    Each distinct path is stat'ed and hashed the first time it is asked for; the same content
+    under the same file name (e.g. a copy in another folder) shares one Attachment and so
+    one encoded MIME part. Parts are released as soon as the last message using them is done
+    (see hold() and done()), so a batch of per-distributor extracts doesn't hold them all.
+    Safe to use from the prepare threads.
+    """
+
+    def __init__(self):
+        self.by_path = {}     # path -> Attachment, or None if missing/unreadable
+        self.by_content = {}  # (sha1, file name) -> Attachment
+        self.users = {}       # Attachment -> messages still to be done with it
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            if path in self.by_path:
+                return self.by_path[path]
+        try:
+            st = os.stat(path)
+            digest = _file_digest(path, st.st_size)
+        except (OSError, ValueError):
+            attachment = None
+        else:
+            with self.lock:
+                attachment = self.by_content.setdefault((digest, os.path.basename(path)),
+                                                        Attachment(path, st.st_size, st.st_mtime_ns, digest))
+        with self.lock:
+            return self.by_path.setdefault(path, attachment)
+
+    def validate(self, paths):
+        """Stat and hash every distinct path up front; returns the ones that are missing"""
+        missing = []
+        for path in dict.fromkeys(paths):
+            if self.get(path) is None:
+                missing.append(path)
+        return missing
+
+    def resolve(self, paths):
+        """Attachments for the paths that exist, without duplicates, in order"""
+        attachments = []
+        for path in paths:
+            attachment = self.get(path)
+            if attachment is not None and attachment not in attachments:
+                attachments.append(attachment)
+        return attachments
+
+    def hold(self, path_lists):
+        """Count, for each attachment, the messages (one list of paths each) that will carry it"""
+        for paths in path_lists:
+            for attachment in self.resolve(paths):
+                with self.lock:
+                    self.users[attachment] = self.users.get(attachment, 0) + 1
+
+    def done(self, paths):
+        """A message carrying paths is sent or has failed for good; release the encoded parts
+        no other message needs"""
+        for attachment in self.resolve(paths):
+            with self.lock:
+                left = self.users.get(attachment, 0) - 1
+                self.users[attachment] = left
+            if left <= 0:
+                attachment.release()
+
+    def close(self):
+        """Drop the encoded parts held for the batch"""
+        with self.lock:
+            for attachment in self.by_content.values():
+                attachment.release()
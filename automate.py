@@ -1,12 +1,29 @@
-import os
 import time
+# Taken before the imports below, for the time-to-first-window figure. A frozen onefile build
+# has already been unpacked and its interpreter started by now, so that part of the launch
+# only shows up in the wall time bench.py --startup measures.
+STARTED = time.perf_counter()
+
+import os
+import sys
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from openpyxl import load_workbook
-import xlrd
-from difflib import SequenceMatcher
-import win32com.client  # For Outlook integration
-import csv
+
+import config
+from distributors import DistributorStore, load_distributors
+from incremental import MatchState, scan_folder
+from jobs import Job, JobRunner
+from lru import LRUCache
+from matching import NameIndex, compare_engines
+from parse_cache import ParseCache
+from results_view import ResultsView
+from revenue import load_revenue_file, load_revenue_files
+from stats import NULL_STATS, RunStats
+from templates import MessageRenderer
+from recipients import check_recipients, clean_email_list, is_valid_email
+
+# sending, transport and extracts (smtplib, email, sqlite3, multiprocessing) are imported on
+# first use, so none of them delays the first window
 
 class ScrollableFrame(ttk.Frame):
     def __init__(self, container, *args, **kwargs):
@@ -38,20 +55,93 @@ class DistributorMatcherApp:
         self.container = ScrollableFrame(root)
         self.container.pack(fill=tk.BOTH, expand=True)
 
-        self.distributor_data = []
-        self.matches = []
-        self.outlook = None
+        self.distributors = DistributorStore()
+        self.transport = None
+        self.transport_job = None
+        self.startup_seconds = None
+        self.closing = False
+        self.parse_cache = ParseCache(config.PARSE_CACHE_DIR, config.PARSE_CACHE_MAX_BYTES)
+        self.layout_cache = ParseCache(config.LAYOUT_CACHE_DIR, config.LAYOUT_CACHE_MAX_BYTES)
+        self.jobs = JobRunner(root)
+        self.match_job = None
+        self.send_job = None
+        self.match_state = MatchState(config.MATCH_ENGINE, config.SCORING_BACKEND)
+        self.distributor_mtime = None
+        self.watch_after = None  # after() id of the pending poll_for_changes, if any
+        self.row_results = {}  # Treeview item id -> (distributor, matches) from the last run
+        self.preview_cache = LRUCache(config.PREVIEW_CACHE_SIZE)
+        self.renderer = MessageRenderer(config.RENDER_CACHE_SIZE, config.HTML_BODIES)  # shared by preview and send
+        self.run_stats = {}    # run name -> RunStats of the latest run
+        self.stats_window = None
 
         self.create_widgets()
-        self.setup_outlook()
+        self.setup_transport()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def setup_transport(self):
+        """Create the mail transport in the background so the window is usable straight away.
+
+        The job also launches Outlook (warm_up); the connection used for "Send Selected" is
+        then opened on the Tk thread the first time it is needed (see ensure_transport).
+        """
+        self.update_status(f"Connecting mail transport ({config.MAIL_TRANSPORT})...")
+
+        def work(job):
+            from transport import create_transport
+            transport = create_transport()
+            transport.warm_up()
+            return transport
+
+        def on_done(transport):
+            self.transport = transport
+            self.update_status(f"Mail transport ready ({transport.name})")
+
+        def on_error(e):
+            messagebox.showerror("Mail Error", f"Could not set up {config.MAIL_TRANSPORT} transport: {e}")
+            self.update_status("Mail transport setup failed")
+
+        self.transport_job = self.jobs.submit(Job("transport", work, on_done=on_done, on_error=on_error))
+
+    def ensure_transport(self):
+        """The mail transport, connected if it reviews messages; None (after telling the user) if unavailable"""
+        if self.transport is None:
+            if self.transport_job and self.transport_job.alive:
+                messagebox.showinfo("Please Wait", "The mail transport is still connecting, try again in a moment")
+            else:
+                messagebox.showerror("Error", "Mail transport not set up")
+            return None
+        if self.transport.supports_display and not self.transport.connected:
+            # Keep the reviewing transport (Outlook) connected for "Send Selected"
+            try:
+                self.transport.open()
+            except Exception as e:
+                messagebox.showerror("Mail Error", f"Could not connect to {self.transport.name}: {e}")
+                return None
+        return self.transport
 
-    def setup_outlook(self):
-        try:
-            self.outlook = win32com.client.Dispatch("Outlook.Application")
-            self.update_status("Outlook connection established")
-        except Exception as e:
-            messagebox.showerror("Outlook Error", f"Could not connect to Outlook: {e}")
-            self.update_status("Outlook connection failed")
+    def record_startup(self, started):
+        """Log the time from process start of this script to the first drawn window"""
+        def on_map(event=None):
+            if (event is not None and event.widget is not self.root) or self.startup_seconds is not None:
+                return
+            self.startup_seconds = time.perf_counter() - started
+            stats = RunStats("startup") if config.COLLECT_STATS else NULL_STATS
+            stats.add_time("time_to_first_window", self.startup_seconds)
+            self.finish_run_stats(stats)
+            if self.startup_seconds > config.STARTUP_BUDGET_SECONDS:
+                self.update_status(f"Slow start: first window after {self.startup_seconds:.2f}s")
+            probe_file = os.environ.get('STARTUP_PROBE_FILE')
+            if probe_file:
+                # Used by bench.py --startup: report and exit as soon as the window is up.
+                # Written to a file, as the windowed build has no stdout.
+                with open(probe_file, "w", encoding="utf-8") as f:
+                    f.write(f"{self.startup_seconds:.4f}\n")
+                self.root.after_idle(self.root.destroy)
+
+        if self.root.winfo_ismapped():
+            on_map()  # already drawn while the widgets were being set up
+        else:
+            self.root.bind("<Map>", on_map, add="+")
 
     def create_widgets(self):
         style = ttk.Style()
@@ -76,29 +166,22 @@ class DistributorMatcherApp:
         ttk.Button(control_frame, text="Browse...", command=self.browse_revenue_folder).grid(row=1, column=2, padx=5)
 
         # Match button
-        ttk.Button(control_frame, text="Find Matches", command=self.find_matches).grid(row=2, column=0, columnspan=3, pady=10)
-
-        # Treeview for matches
-        tree_frame = ttk.Frame(main_frame)
-        tree_frame.pack(fill=tk.BOTH, expand=True)
-        
-        self.tree = ttk.Treeview(tree_frame, columns=("name", "email", "status", "file", "commission", "month"), 
-                                show="headings", height=12)
-        for col, width in zip(["name", "email", "status", "file", "commission", "month"], [180, 200, 120, 150, 100, 100]):
-            self.tree.heading(col, text=col.capitalize())
-            self.tree.column(col, width=width)
-        
-        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        ttk.Button(control_frame, text="Find Matches", command=self.find_matches).grid(row=2, column=0, pady=10)
+        ttk.Button(control_frame, text="Cancel", command=self.cancel_matching).grid(row=2, column=1, pady=10)
+        ttk.Button(control_frame, text="Clear Cache", command=self.clear_parse_cache).grid(row=2, column=2, padx=5, pady=10)
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Auto-refresh", variable=self.watch_var,
+                        command=self.toggle_watch).grid(row=2, column=3, padx=5, pady=10)
+        ttk.Button(control_frame, text="Run Stats", command=self.show_run_stats).grid(row=2, column=4, padx=5, pady=10)
+        self.profile_var = tk.BooleanVar(value=config.PROFILE_RUNS)
+        ttk.Checkbutton(control_frame, text="Profile runs", variable=self.profile_var).grid(row=2, column=5, padx=5, pady=10)
+
+        # Treeview for matches; only the visible window of rows is ever inserted into it
+        self.results = ResultsView(main_frame, height=12)
+        self.results.pack(fill=tk.BOTH, expand=True)
+        self.tree = self.results.tree
         
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
-        tree_frame.grid_columnconfigure(0, weight=1)
-        
-        self.tree.bind('<<TreeviewSelect>>', self.show_file_preview)
+        self.tree.bind('<<TreeviewSelect>>', self.show_file_preview, add="+")
 
         # Preview section
         preview_frame = ttk.LabelFrame(main_frame, text="File Preview", padding="10")
@@ -127,20 +210,27 @@ class DistributorMatcherApp:
         # Send buttons
         ttk.Button(email_frame, text="Send Selected", command=self.send_selected_email).grid(row=2, column=0, padx=5, pady=5)
         ttk.Button(email_frame, text="Send All Matched", command=self.send_all_matched_emails).grid(row=2, column=1, padx=5, pady=5)
-        ttk.Button(email_frame, text="Test Outlook", command=self.test_outlook).grid(row=2, column=2, padx=5, pady=5)
+        ttk.Button(email_frame, text="Test Connection", command=self.test_transport).grid(row=2, column=2, padx=5, pady=5)
 
         self.status_var = tk.StringVar()
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(fill=tk.X, pady=(5, 0))
 
-    def test_outlook(self):
+    def test_transport(self):
+        from transport import create_transport
         try:
-            outlook = win32com.client.Dispatch("Outlook.Application")
-            messagebox.showinfo("Outlook Test", "Outlook connection successful!")
-            self.update_status("Outlook test successful")
+            with create_transport() as transport:
+                pass
+            messagebox.showinfo("Connection Test", f"{transport.name} connection successful!")
+            self.update_status(f"{transport.name} test successful")
         except Exception as e:
-            messagebox.showerror("Outlook Error", f"Could not connect to Outlook: {e}")
-            self.update_status("Outlook test failed")
+            messagebox.showerror("Mail Error", f"Could not connect to {config.MAIL_TRANSPORT}: {e}")
+            self.update_status("Connection test failed")
+
+    def clear_parse_cache(self):
+        # The layout cache is kept: layouts stay valid, and extracts rely on it on every send
+        removed = self.parse_cache.clear()
+        self.update_status(f"Cleared {removed} cached revenue files")
 
     def browse_distributor_file(self):
         path = filedialog.askopenfilename(filetypes=[("Excel/CSV Files", "*.xlsx *.xls *.csv")])
@@ -158,61 +248,14 @@ class DistributorMatcherApp:
 
     def load_distributor_data(self, path):
         try:
-            ext = os.path.splitext(path)[-1].lower()
-            data = []
-
-            if ext == ".csv":
-                with open(path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        data.append({
-                            'name': str(row.get('Distributors', '')).strip(),
-                            'email': str(row.get('Distributor Email Address "TO"', '')).strip(),
-                            'cc': str(row.get('Ncell Email address "CC"', '')).strip(),
-                            'subject': str(row.get('Subject', '')).strip(),
-                            'body': str(row.get('Body', '')).strip(),
-                            'regards': str(row.get('Regards', '')).strip()
-                        })
-            elif ext == ".xlsx":
-                wb = load_workbook(path)
-                sheet = wb.active
-                headers = [cell.value for cell in sheet[1]]
-                for row in sheet.iter_rows(min_row=2, values_only=True):
-                    row_dict = dict(zip(headers, row))
-                    data.append({
-                        'name': str(row_dict.get('Distributors', '')).strip(),
-                        'email': str(row_dict.get('Distributor Email Address "TO"', '')).strip(),
-                        'cc': str(row_dict.get('Ncell Email address "CC"', '')).strip(),
-                        'subject': str(row_dict.get('Subject', '')).strip(),
-                        'body': str(row_dict.get('Body', '')).strip(),
-                        'regards': str(row_dict.get('Regards', '')).strip()
-                    })
-            elif ext == ".xls":
-                wb = xlrd.open_workbook(path)
-                sheet = wb.sheet_by_index(0)
-                headers = sheet.row_values(0)
-                for row_idx in range(1, sheet.nrows):
-                    row = sheet.row_values(row_idx)
-                    row_dict = dict(zip(headers, row))
-                    data.append({
-                        'name': str(row_dict.get('Distributors', '')).strip(),
-                        'email': str(row_dict.get('Distributor Email Address "TO"', '')).strip(),
-                        'cc': str(row_dict.get('Ncell Email address "CC"', '')).strip(),
-                        'subject': str(row_dict.get('Subject', '')).strip(),
-                        'body': str(row_dict.get('Body', '')).strip(),
-                        'regards': str(row_dict.get('Regards', '')).strip()
-                    })
-            else:
-                raise Exception("Unsupported file format")
-
-            self.distributor_data = data
-            self.update_status(f"Loaded {len(data)} distributors.")
+            self.distributors = load_distributors(path)
+            self.update_status(f"Loaded {len(self.distributors)} distributors.")
         except Exception as e:
             messagebox.showerror("Error", f"Could not load distributor file:\n{e}")
             self.update_status("Error loading file")
 
     def find_matches(self):
-        if not self.distributor_data:
+        if not self.distributors:
             messagebox.showwarning("Missing", "Load distributor data first")
             return
 
@@ -221,98 +264,150 @@ class DistributorMatcherApp:
             messagebox.showwarning("Missing", "Select a valid revenue folder")
             return
 
-        self.tree.delete(*self.tree.get_children())
-        matched_count = 0
-
-        for distributor in self.distributor_data:
-            all_matches = []  # Store all matches for this distributor
+        if self.match_job and self.match_job.alive:
+            # The state can only be updated by one run at a time; restart once the old one stops
+            self.match_job.cancel()
+            self.root.after(100, self.find_matches)
+            return
 
-            for file in os.listdir(folder):
-                if not file.endswith(('.xlsx', '.xls', '.csv')):
-                    continue
-                file_path = os.path.join(folder, file)
-                match_info = self.find_match_in_file(file_path, distributor['name'])
-                if match_info and match_info['match_ratio'] > 0.8:  # Using our threshold
-                    all_matches.append(match_info)
-
-            if all_matches:
-                matched_count += 1
-                status = "✔ MATCHED"
-                # Sort matches by ratio (descending)
-                all_matches.sort(key=lambda x: x['match_ratio'], reverse=True)
-                # Store all file paths in the tree (we'll join them with semicolons)
-                file_names = ";".join([os.path.basename(m['filepath']) for m in all_matches])
-                self.tree.insert("", tk.END, values=(
-                    distributor['name'],
-                    distributor['email'],
-                    status,
-                    file_names,  # Now contains all matching files
-                    all_matches[0].get('commission', ''),  # Just show first match's commission
-                    all_matches[0].get('month', '')       # Just show first match's month
-                ), tags=('matched',))
-            else:
-                self.tree.insert("", tk.END, values=(distributor['name'], distributor['email'], "✖ NO MATCH", "", "", ""), tags=('unmatched',))
-        
-        self.tree.tag_configure('matched', background='#e6ffe6')
-        self.tree.tag_configure('unmatched', background='#ffe6e6')
+        distributors = list(self.distributors)
+        self.distributor_mtime = self._mtime(self.distributor_entry.get())
+        stats = self.new_run_stats("match")
+
+        def load_files(paths):
+            job.progress(0, len(distributors), f"Reading {len(paths)} new or changed revenue files...")
+            return load_revenue_files(paths, on_error=lambda path, e: job.progress(0, len(distributors), f"Error reading {path}: {e}"),
+                                      cache=self.parse_cache, workers=config.INGEST_WORKERS,
+                                      layouts=self.layout_cache)
+
+        def work(job):
+            # Only new/changed files are parsed and only new/edited distributors are re-matched
+            self.parse_cache.hits = self.parse_cache.misses = 0
+            with stats.profiling():
+                for event in self.match_state.update(folder, distributors, load_files, job.checkpoint, stats):
+                    job.emit(event)
+                    if event[0] == 'row' and event[2] % 25 == 24:
+                        job.progress(event[2] + 1, len(distributors), f"Matching... {event[2] + 1}/{len(distributors)}")
+
+                table = self.match_state.table()
+                mismatches = []
+                if config.MATCH_ENGINE == "compare":
+                    with stats.timer("compare_engines"):
+                        mismatches = compare_engines(table, NameIndex(table), [d.name for d in distributors])
+            stats.count("cache_hits", self.parse_cache.hits)
+            stats.count("rows_indexed", table.row_count)
+            return table, mismatches
+
+        def on_item(event):
+            if job is self.match_job:
+                with stats.timer("treeview_updates"):
+                    self.apply_match_event(event)
+
+        def on_done(result):
+            if job is not self.match_job:
+                return
+            self.finish_run_stats(stats)
+            self.results.refresh()
+            if result is None:
+                self.update_status("Matching cancelled.")
+                return
+            table, mismatches = result
+            self.update_status(f"Done. {self.match_state.matched_count}/{len(distributors)} matched "
+                               f"({len(table)} files, {table.row_count} rows, {self.parse_cache.hits} from cache).")
+            if mismatches:
+                details = "\n".join(name for name, _, _ in mismatches[:20])
+                messagebox.showwarning("Engine Mismatch",
+                                       f"Indexed matcher differs from full scan for {len(mismatches)} distributors:\n{details}")
+
+        def on_error(e):
+            if job is self.match_job:
+                self.finish_run_stats(stats)
+                messagebox.showerror("Error", f"Matching failed:\n{e}")
+                self.update_status("Matching failed")
+
+        job = Job("match", work, on_progress=lambda done, total, text: self.update_status(text),
+                  on_item=on_item, on_done=on_done, on_error=on_error)
+        self.match_job = self.jobs.submit(job)
+
+    def cancel_matching(self):
+        if self.match_job and self.match_job.alive:
+            self.match_job.cancel()
+            self.update_status("Cancelling...")
+
+    def apply_match_event(self, event):
+        """Apply one MatchState change to the Treeview, touching only the affected row"""
+        kind = event[0]
+        if kind == 'clear':
+            self.results.clear()
+            self.row_results.clear()
+            self.preview_cache.clear()
+            return
+        if kind == 'remove':
+            self.row_results.pop(event[1], None)
+            self.results.remove(event[1])
+            return
 
-        self.update_status(f"Done. {matched_count}/{len(self.distributor_data)} matched.")
+        _, iid, position, distributor, all_matches = event
+        self.row_results[iid] = (distributor, all_matches)
+        self.preview_cache.discard(iid)
+        if all_matches:
+            status = "✔ MATCHED"
+            # Store all file paths in the tree (we'll join them with semicolons)
+            file_names = ";".join([os.path.basename(m['filepath']) for m in all_matches])
+            values = (
+                distributor.name,
+                distributor.email,
+                status,
+                file_names,  # Now contains all matching files
+                all_matches[0].get('commission', ''),  # Just show first match's commission
+                all_matches[0].get('month', ''),      # Just show first match's month
+                round(all_matches[0]['match_ratio'], 3)
+            )
+            tags = ('matched',)
+        else:
+            values = (distributor.name, distributor.email, "✖ NO MATCH", "", "", "", "")
+            tags = ('unmatched',)
 
-    def find_match_in_file(self, path, target_name):
-        ext = os.path.splitext(path)[-1].lower()
+        self.results.upsert(iid, position, values, tags)
 
+    @staticmethod
+    def _mtime(path):
         try:
-            headers = []
-            rows = []
-
-            if ext == ".xlsx":
-                wb = load_workbook(path, read_only=True)
-                sheet = wb.active
-                headers = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
-                for row in sheet.iter_rows(min_row=2, values_only=True):
-                    rows.append(row)
-            elif ext == ".xls":
-                wb = xlrd.open_workbook(path)
-                sheet = wb.sheet_by_index(0)
-                headers = sheet.row_values(0)
-                for i in range(1, sheet.nrows):
-                    rows.append(sheet.row_values(i))
-            elif ext == ".csv":
-                with open(path, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    headers = next(reader)
-                    for row in reader:
-                        rows.append(row)
-            else:
-                return None
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
 
-            possible_keys = ["Distributors", "Distributor' Name", "Distributor Name","Distributor"]
-            name_col = next((headers.index(k) for k in possible_keys if k in headers), None)
+    def toggle_watch(self):
+        """Start or stop polling; only one poll_for_changes chain is ever scheduled"""
+        if self.watch_after is not None:
+            self.root.after_cancel(self.watch_after)
+            self.watch_after = None
+        if self.watch_var.get():
+            self.watch_after = self.root.after(config.WATCH_INTERVAL_MS, self.poll_for_changes)
+
+    def poll_for_changes(self):
+        """Re-run matching when the revenue folder or the distributor file changes on disk"""
+        self.watch_after = None
+        if not self.watch_var.get():
+            return
+        busy = (self.match_job and self.match_job.alive) or (self.send_job and self.send_job.alive)
+        folder = self.revenue_entry.get()
+        if not busy and self.distributors and folder and os.path.isdir(folder):
+            distributor_path = self.distributor_entry.get()
+            mtime = self._mtime(distributor_path)
+            if mtime is not None and mtime != self.distributor_mtime:
+                self.load_distributor_data(distributor_path)
+                self.find_matches()
+            elif folder != self.match_state.folder or scan_folder(folder) != self.match_state.signature():
+                self.find_matches()
+        self.watch_after = self.root.after(config.WATCH_INTERVAL_MS, self.poll_for_changes)
 
-            if name_col is None:
+    def find_match_in_file(self, path, target_name):
+        try:
+            revenue_file = load_revenue_file(path, self.parse_cache, self.layout_cache)
+            if revenue_file is None:
                 return None
-
-            best = None
-            best_ratio = 0
-
-            for row in rows:
-                name_in_file = str(row[name_col]).strip()
-                ratio = SequenceMatcher(None, name_in_file.lower(), target_name.lower()).ratio()
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    row_data = dict(zip(headers, row))
-                    best = {
-                        'filepath': path,
-                        'match_ratio': ratio,
-                        'commission': row_data.get('Package Number', '') or row_data.get('Commission', ''),
-                        'month': row_data.get('Ecare Month', '') or row_data.get('Month', ''),
-                        'headers': headers,
-                        'rows': rows
-                    }
-
-            if best:
-                best['match_ratio'] = best_ratio
-            return best
+            return revenue_file.best_match(target_name)
         except Exception as e:
             self.update_status(f"Error reading {path}: {e}")
             return None
@@ -321,71 +416,83 @@ class DistributorMatcherApp:
         selected_item = self.tree.focus()
         if not selected_item:
             return
-            
-        item_values = self.tree.item(selected_item, 'values')
-        if len(item_values) < 4 or not item_values[3]:
-            self.preview_text.delete(1.0, tk.END)
-            self.preview_text.insert(tk.END, "No file selected or no match found")
-            self.email_preview_text.delete(1.0, tk.END)
-            return
-            
-        file_names = item_values[3].split(';')
-        folder = self.revenue_entry.get()
-        
-        distributor_name = item_values[0]
-        distributor = next((d for d in self.distributor_data if d['name'] == distributor_name), None)
-        
-        if not distributor:
-            self.preview_text.delete(1.0, tk.END)
-            self.preview_text.insert(tk.END, "Could not find distributor details")
-            self.email_preview_text.delete(1.0, tk.END)
+
+        result = self.row_results.get(selected_item)
+        if not result or not result[1]:
+            self.set_preview("No file selected or no match found", "")
             return
-            
-        # Build complete email body with regards
-        complete_body = distributor['body']
-        if distributor.get('regards'):
-            complete_body += f"\n\nRegards,\n{distributor['regards']}"
-        
-        self.email_preview_text.delete(1.0, tk.END)
-        self.email_preview_text.insert(tk.END, f"To: {distributor['email']}\n")
-        self.email_preview_text.insert(tk.END, f"Cc: {distributor['cc']}\n")
-        self.email_preview_text.insert(tk.END, f"Subject: {distributor['subject']}\n")
-        self.email_preview_text.insert(tk.END, f"\nBody:\n{complete_body}")
 
+        distributor, matches = result
+        # Files edited since matching are re-read; everything else comes from the match results
+        signatures = tuple(self._file_signature(m['filepath']) for m in matches)
+        cached = self.preview_cache.get(selected_item)
+        if cached is None or cached[0] != signatures:
+            cached = (signatures, self.render_preview(distributor, matches, signatures))
+            self.preview_cache.put(selected_item, cached)
+        self.set_preview(*cached[1])
+
+    def set_preview(self, file_text, email_text):
         self.preview_text.delete(1.0, tk.END)
-        self.preview_text.insert(tk.END, f"Found {len(file_names)} matching files:\n\n")
-        
-        for i, file_name in enumerate(file_names, 1):
-            file_path = os.path.join(folder, file_name.strip())
-            if not os.path.exists(file_path):
-                self.preview_text.insert(tk.END, f"{i}. {file_name} (File not found)\n\n")
-                continue
-                
-            match_info = self.find_match_in_file(file_path, distributor_name)
-            
-            if not match_info:
-                self.preview_text.insert(tk.END, f"{i}. {file_name} (Could not load match details)\n\n")
+        self.preview_text.insert(tk.END, file_text)
+        self.email_preview_text.delete(1.0, tk.END)
+        self.email_preview_text.insert(tk.END, email_text)
+
+    def _file_signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def render_preview(self, distributor, matches, signatures):
+        """Build the file and email preview texts for one result row"""
+        rendered = self.renderer.render(distributor, matches)
+        email_text = (f"To: {distributor.email}\n"
+                      f"Cc: {distributor.cc}\n"
+                      f"Subject: {rendered.subject}\n"
+                      f"\nBody{' (HTML)' if rendered.html else ''}:\n{rendered.body}")
+
+        parts = [f"Found {len(matches)} matching files:\n\n"]
+        for i, (match_info, signature) in enumerate(zip(matches, signatures), 1):
+            file_path = match_info['filepath']
+            file_name = os.path.basename(file_path)
+            if match_info.get('sheet'):
+                file_name += f" [{match_info['sheet']}]"
+            if signature is None:
+                parts.append(f"{i}. {file_name} (File not found)\n\n")
                 continue
-                
-            self.preview_text.insert(tk.END, f"{i}. {file_name} (Match ratio: {match_info['match_ratio']:.2f})\n")
-            
+
+            if self.match_state.file_signature(file_path) != signature:
+                match_info = self.find_match_in_file(file_path, distributor.name)
+                if not match_info:
+                    parts.append(f"{i}. {file_name} (Could not load match details)\n\n")
+                    continue
+                file_name += " - changed since matching"
+
+            parts.append(f"{i}. {file_name} (Match ratio: {match_info['match_ratio']:.2f})\n")
+
             headers = match_info.get('headers', [])
-            self.preview_text.insert(tk.END, "Headers:\n")
-            self.preview_text.insert(tk.END, "\t".join(str(h) for h in headers) + "\n")
-            
+            parts.append("Headers:\n")
+            parts.append("\t".join(str(h) for h in headers) + "\n")
+
             rows = match_info.get('rows', [])
-            self.preview_text.insert(tk.END, f"First {min(3, len(rows))} rows:\n")
+            row_count = match_info.get('row_count', len(rows))
+            parts.append(f"First {min(3, len(rows))} rows:\n")
             for row in rows[:3]:
-                self.preview_text.insert(tk.END, "\t".join(str(cell) for cell in row) + "\n")
-                
-            if len(rows) > 3:
-                self.preview_text.insert(tk.END, f"... and {len(rows)-3} more rows\n")
-            
-            self.preview_text.insert(tk.END, "\n")
+                parts.append("\t".join(str(cell) for cell in row) + "\n")
+
+            if row_count > 3:
+                parts.append(f"... and {row_count-3} more rows\n")
+
+            parts.append("\n")
+        return "".join(parts), email_text
 
     def send_selected_email(self):
-        if not self.outlook:
-            messagebox.showerror("Error", "Outlook connection not established")
+        from extracts import extract_attachments
+        from sending import PrepareError, prepare_message
+        from transport import TransportError
+
+        if not self.ensure_transport():
             return
 
         selected_item = self.tree.focus()
@@ -393,211 +500,252 @@ class DistributorMatcherApp:
             messagebox.showwarning("No Selection", "Please select a distributor from the list")
             return
             
-        item_values = self.tree.item(selected_item, 'values')
-        if len(item_values) < 4 or not item_values[3] or "MATCHED" not in item_values[2]:
+        # Row ids are distributor ids, so both lookups are constant-time and unambiguous
+        distributor = self.distributors.get(selected_item)
+        result = self.row_results.get(selected_item)
+        if not result or not result[1]:
             messagebox.showwarning("No Match", "Selected distributor has no matched file")
             return
             
-        distributor_name = item_values[0]
-        distributor = next((d for d in self.distributor_data if d['name'] == distributor_name), None)
-        
         if not distributor:
             messagebox.showerror("Error", "Could not find distributor details")
             return
-            
-        file_names = item_values[3].split(';')
-        folder = self.revenue_entry.get()
-        
+
+        file_paths = [m['filepath'] for m in result[1]]
+        if config.SEND_EXTRACTS:
+            file_paths = extract_attachments(distributor, result[1], config.EXTRACT_DIR, self.layout_cache)
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                messagebox.showwarning("File Missing", f"Could not find file: {file_path}")
+
         try:
-            mail = self.outlook.CreateItem(0)
-            mail.To = distributor['email']
-            
-            if distributor['cc'] and "@" in distributor['cc']:
-                mail.CC = distributor['cc']
-            
-            mail.Subject = distributor['subject']
-            
-            # Build complete body with regards
-            complete_body = distributor['body']
-            if distributor.get('regards'):
-                complete_body += f"\n\nRegards,\n{distributor['regards']}"
-            mail.Body = complete_body
-            
-            # Add all attachments
-            attachments_added = 0
-            for file_name in file_names:
-                file_path = os.path.join(folder, file_name.strip())
-                if os.path.exists(file_path):
-                    mail.Attachments.Add(file_path)
-                    attachments_added += 1
-                else:
-                    messagebox.showwarning("File Missing", f"Could not find file: {file_path}")
-            
-            if attachments_added == 0:
-                messagebox.showerror("Error", "No valid attachments found")
+            message = prepare_message(distributor, file_paths,
+                                      rendered=self.renderer.render(distributor, result[1]))
+        except PrepareError as e:
+            messagebox.showerror("Error", e.args[1])
+            return
+
+        distributor_name = distributor.name
+        try:
+            if self.transport.supports_display:
+                self.transport.display(message)
+                self.update_status(f"Email prepared for {distributor_name} with {len(message.attachments)} attachments. Please review and send.")
                 return
-            
-            try:
-                mail.Recipients.ResolveAll()
-            except Exception as resolve_error:
-                unresolved = [r.Name for r in mail.Recipients if not r.Resolved]
-                messagebox.showerror("Recipient Error",
-                                   f"Could not resolve recipients: {', '.join(unresolved)}")
+
+            confirm = messagebox.askyesno("Confirm",
+                                          f"The {self.transport.name} transport cannot open emails for review.\n"
+                                          f"Send to {message.to} now?")
+            if not confirm:
                 return
-                
-            mail.Display(True)
-            
-            self.update_status(f"Email prepared for {distributor_name} with {attachments_added} attachments. Please review and send.")
-            
+            with self.transport:
+                self.transport.send(message)
+            self.update_status(f"Email sent to {distributor_name} with {len(message.attachments)} attachments.")
+
+        except TransportError as e:
+            messagebox.showerror("Recipient Error", str(e))
         except Exception as e:
             messagebox.showerror("Email Error", f"Could not create email: {str(e)}")
             self.update_status(f"Email creation failed: {str(e)}")
 
     def send_all_matched_emails(self):
-        if not self.outlook:
-            messagebox.showerror("Error", "Outlook connection not established")
+        from sending import SendPipeline, TokenBucket
+        from transport import create_transport
+
+        if not self.ensure_transport():
             return
 
-        matched_items = [self.tree.item(item) for item in self.tree.get_children() 
-                       if "MATCHED" in self.tree.item(item, 'values')[2]]
+        # Match order of every row (not just the filtered/visible ones), looked up by id
+        matched_items = [item for item in self.results.ids()
+                         if item in self.row_results and self.row_results[item][1]]
         
         if not matched_items:
             messagebox.showinfo("No Matches", "No matched distributors found")
             return
             
-        confirm = messagebox.askyesno("Confirm", 
-                                    f"Send emails to all {len(matched_items)} matched distributors?")
+        # Syntax pre-flight over the whole list, so bad addresses show up before anything is built
+        distributors = [self.row_results[item][0] for item in matched_items]
+        report = check_recipients(distributors)
+        question = f"Send emails to all {len(matched_items)} matched distributors?"
+        if report.problems:
+            question = (f"{len(report.problems)} of {len(matched_items)} matched distributors have invalid "
+                        f"email addresses and will be skipped:\n\n{report.summary(distributors)}\n\n"
+                        f"Send emails to the other {len(matched_items) - len(report.problems)}?")
+        if report.warnings:
+            question = (f"Invalid CC addresses will be left off {len(report.warnings)} emails:\n\n"
+                        f"{report.warning_summary(distributors)}\n\n{question}")
+        confirm = messagebox.askyesno("Confirm", question)
         if not confirm:
             return
             
-        folder = self.revenue_entry.get()
-        success_count = 0
-        failed_count = 0
+        if self.send_job and self.send_job.alive:
+            messagebox.showwarning("Busy", "A bulk send is already running")
+            return
+
+        # Snapshot everything the worker needs; it must not touch Tk widgets
+        work_items = [self.row_results[item] for item in matched_items]
+
+        counts = {'success': 0, 'failed': 0}
         failed_distributors = []
         
         progress = tk.Toplevel(self.root)
         progress.title("Sending Emails")
-        progress.geometry("400x150")
+        progress.geometry("400x180")
         
         tk.Label(progress, text="Sending emails...").pack(pady=5)
         progress_bar = ttk.Progressbar(progress, orient="horizontal", length=350, mode="determinate")
         progress_bar.pack(pady=5)
-        progress_bar["maximum"] = len(matched_items)
+        progress_bar["maximum"] = len(work_items)
         status_label = tk.Label(progress, text="")
         status_label.pack()
         details_label = tk.Label(progress, text="", wraplength=350)
         details_label.pack()
-        
-        progress.update()
-        
-        for item in matched_items:
-            values = item['values']
-            distributor_name = values[0]
-            status_label.config(text=f"Processing: {distributor_name}")
+
+        button_frame = ttk.Frame(progress)
+        button_frame.pack(pady=5)
+        pause_button = ttk.Button(button_frame, text="Pause")
+        pause_button.grid(row=0, column=0, padx=5)
+        cancel_button = ttk.Button(button_frame, text="Cancel")
+        cancel_button.grid(row=0, column=1, padx=5)
+
+        stats = self.new_run_stats("send")
+
+        def work(job):
+            bucket = TokenBucket(config.SEND_RATE_PER_MINUTE / 60.0, config.SEND_BURST)
+            pipeline = SendPipeline(create_transport(), bucket, config.SEND_PREPARE_WORKERS,
+                                    extract_dir=config.EXTRACT_DIR if config.SEND_EXTRACTS else None,
+                                    extract_workers=config.INGEST_WORKERS, journal_path=config.SEND_JOURNAL,
+                                    retry_attempts=config.SEND_RETRY_ATTEMPTS,
+                                    retry_base_seconds=config.SEND_RETRY_BASE_SECONDS, stats=stats,
+                                    renderer=self.renderer, check_dns=config.RECIPIENT_DNS_CHECK,
+                                    layouts=self.layout_cache)
+            with stats.profiling():
+                for result in pipeline.run(work_items, job):
+                    job.emit(result)
+
+        def on_progress(done, total, text):
+            status_label.config(text=text)
             details_label.config(text="")
-            progress.update()
-            
-            distributor = next((d for d in self.distributor_data if d['name'] == distributor_name), None)
-            
-            if not distributor:
-                details_label.config(text="No distributor data found")
-                failed_count += 1
-                failed_distributors.append(f"{distributor_name} - No data")
-                progress_bar["value"] += 1
-                continue
-                
-            if not self.is_valid_email(distributor['email']):
-                details_label.config(text=f"Invalid email: {distributor['email']}")
-                failed_count += 1
-                failed_distributors.append(f"{distributor_name} - Bad email")
-                progress_bar["value"] += 1
-                continue
-                
-            file_names = values[3].split(';')
-            attachments_added = 0
-            
-            try:
-                mail = self.outlook.CreateItem(0)
-                mail.To = distributor['email']
-                
-                if distributor.get('cc'):
-                    cleaned_cc = self.clean_email_list(distributor['cc'])
-                    if cleaned_cc:
-                        mail.CC = cleaned_cc
-                
-                mail.Subject = distributor['subject']
-                
-                # Build complete body with regards
-                complete_body = distributor['body']
-                if distributor.get('regards'):
-                    complete_body += f"\n\nRegards,\n{distributor['regards']}"
-                mail.Body = complete_body
-                
-                # Add all attachments
-                for file_name in file_names:
-                    file_path = os.path.join(folder, file_name.strip())
-                    if os.path.exists(file_path):
-                        mail.Attachments.Add(file_path)
-                        attachments_added += 1
-                
-                if attachments_added == 0:
-                    raise ValueError("No valid attachments found")
-                
-                unresolved = []
-                try:
-                    mail.Recipients.ResolveAll()
-                    unresolved = [r.Name for r in mail.Recipients if not r.Resolved]
-                except Exception as resolve_error:
-                    unresolved = [r.Name for r in mail.Recipients]
-                
-                if unresolved:
-                    raise ValueError(f"Unresolved recipients: {', '.join(unresolved)}")
-                
-                mail.Send()
-                success_count += 1
-                details_label.config(text=f"Sent with {attachments_added} attachments")
-                
-            except Exception as e:
-                error_msg = str(e)
-                details_label.config(text=error_msg)
-                failed_count += 1
-                failed_distributors.append(f"{distributor_name} - {error_msg}")
-                
+
+        def on_item(result):
+            distributor, error_msg, detail = result
+            if error_msg is None:
+                counts['success'] += 1
+            else:
+                counts['failed'] += 1
+                failed_distributors.append(f"{distributor.name} - {error_msg}")
+            details_label.config(text=detail)
             progress_bar["value"] += 1
-            time.sleep(1)
-            progress.update()
-            
-        progress.destroy()
-        
-        result_message = f"Completed: {success_count} sent, {failed_count} failed"
-        if failed_distributors:
-            result_message += "\n\nFailed items:\n" + "\n".join(failed_distributors)
-        
-        messagebox.showinfo("Results", result_message)
-        self.update_status(f"Email sending complete. {success_count} sent, {failed_count} failed")
+
+        def finish(result, cancelled=False):
+            progress.destroy()
+            self.finish_run_stats(stats)
+            result_message = f"{'Cancelled' if cancelled else 'Completed'}: {counts['success']} sent, {counts['failed']} failed"
+            if failed_distributors:
+                result_message += "\n\nFailed items:\n" + "\n".join(failed_distributors)
+            messagebox.showinfo("Results", result_message)
+            self.update_status(f"Email sending {'cancelled' if cancelled else 'complete'}. "
+                               f"{counts['success']} sent, {counts['failed']} failed")
+
+        def on_error(e):
+            failed_distributors.append(f"Send job stopped - {e}")
+            finish(None)
+
+        def toggle_pause():
+            if job.paused:
+                job.resume()
+                pause_button.config(text="Pause")
+            else:
+                job.pause()
+                pause_button.config(text="Resume")
+                status_label.config(text="Paused")
+
+        def cancel():
+            job.cancel()
+            status_label.config(text="Cancelling...")
+
+        job = Job("send", work, on_progress=on_progress, on_item=on_item,
+                  on_done=lambda result: finish(result, job.cancelled), on_error=on_error)
+        pause_button.config(command=toggle_pause)
+        cancel_button.config(command=cancel)
+        progress.protocol("WM_DELETE_WINDOW", cancel)
+        self.send_job = self.jobs.submit(job)
+
+    def new_run_stats(self, name):
+        profile_dir = config.PROFILE_DIR if self.profile_var.get() else None
+        if config.COLLECT_STATS or profile_dir:
+            return RunStats(name, profile_dir)
+        return NULL_STATS
+
+    def finish_run_stats(self, stats):
+        """Log a finished run's stats and show them in the Run Stats window"""
+        if not stats.enabled:
+            return
+        stats.finish()
+        try:
+            stats.write(config.STATS_LOG)
+        except OSError as e:
+            self.update_status(f"Could not write run stats: {e}")
+        self.run_stats[stats.name] = stats
+        self.refresh_run_stats()
+
+    def show_run_stats(self):
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+        else:
+            self.stats_window = tk.Toplevel(self.root)
+            self.stats_window.title("Run Stats")
+            self.stats_window.geometry("460x360")
+            self.stats_text = tk.Text(self.stats_window, wrap=tk.NONE, font=("Courier", 9))
+            self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_run_stats()
+
+    def refresh_run_stats(self):
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            return
+        if self.run_stats:
+            text = "\n\n".join(stats.summary() for stats in self.run_stats.values())
+        else:
+            text = "No runs yet." if config.COLLECT_STATS else "Run stats are disabled (COLLECT_STATS=0)."
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state=tk.DISABLED)
 
     def is_valid_email(self, email):
         """Basic email validation"""
-        if not email or not isinstance(email, str):
-            return False
-        return '@' in email and '.' in email.split('@')[-1]
+        return is_valid_email(email)
 
     def clean_email_list(self, emails):
         """Clean and validate a list of emails (for CC field)"""
-        if not emails:
-            return ""
-        valid_emails = []
-        for email in emails.split(';'):
-            email = email.strip()
-            if self.is_valid_email(email):
-                valid_emails.append(email)
-        return ";".join(valid_emails)
+        return clean_email_list(emails)
+
+    def on_close(self, waited_ms=0):
+        """Cancel running jobs and let a bulk send close its journal before the window goes.
+
+        Job threads are daemons, so destroying the window straight away would kill a send
+        mid-batch and lose the journal rows it had not committed yet.
+        """
+        if not waited_ms:
+            if self.closing:
+                return
+            self.closing = True
+            self.update_status("Closing: waiting for running jobs to stop...")
+            self.jobs.cancel_all()
+        if self.send_job and self.send_job.alive and waited_ms < config.CLOSE_WAIT_MS:
+            self.root.after(50, self.on_close, waited_ms + 50)
+            return
+        self.root.destroy()
 
     def update_status(self, msg):
         self.status_var.set(msg)
         self.root.update_idletasks()
 
 if __name__ == "__main__":
+    # Revenue parsing workers re-launch this executable when frozen; let them through before Tk starts
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     root = tk.Tk()
     app = DistributorMatcherApp(root)
+    app.record_startup(STARTED)
     root.mainloop()
\ No newline at end of file
@@ -1,4 +1,18 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# Modules nothing in the app imports, but which the analysis pulls in (openpyxl probes for
+# pandas/PIL, and a dev environment may have test/doc tooling installed). Every excluded
+# module is one less thing the onefile bootloader has to unpack on each launch.
+EXCLUDES = [
+    'unittest', 'doctest', 'pydoc', 'pdb', 'lib2to3', 'idlelib', 'turtle', 'turtledemo', 'curses',
+    'tkinter.test', 'test', 'xmlrpc', 'http.server', 'distutils', 'setuptools', 'pkg_resources', 'pip',
+    'pandas', 'PIL', 'matplotlib', 'IPython', 'scipy', 'pytest', 'xlwt',
+]
+
+# AUTOMATE_ONEDIR=1 builds a folder instead of a single exe: nothing is unpacked at launch,
+# which is the fastest way to start (see STARTUP_BUDGET_SECONDS in config.py)
+ONEDIR = os.environ.get('AUTOMATE_ONEDIR', '0') == '1'
 
 
 a = Analysis(
@@ -10,29 +24,51 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='automate',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if ONEDIR:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='automate',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(exe, a.binaries, a.datas, strip=False, upx=False, name='automate')
+else:
+    # UPX is off: decompressing every DLL again on each launch costs more than the smaller
+    # download saves
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='automate',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
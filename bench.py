@@ -0,0 +1,362 @@
+"""Benchmark harness: generate a synthetic distributor list and revenue folder, then time
+loading, ingestion, matching and sending (through a mock transport) and print a JSON report.
+
+    python bench.py --distributors 600 --files 20 --rows 5000 --noise 0.3 --formats xlsx,csv
+    python bench.py --engines indexed,batch:rapidfuzz,batch:trigram --send --extracts --output bench.json
+    python bench.py --startup 5 --startup-command dist/automate.exe
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+import multiprocessing
+
+import config
+from distributors import load_distributors
+from matching import NameIndex
+from revenue import RevenueTable, load_revenue_folder
+from scoring import BatchScorer
+from transport import Transport, build_mime
+
+WORDS = ("Himal Everest Sagar Kathmandu Pokhara Lalitpur Bhaktapur Chitwan Janakpur Biratnagar Nepal Ganesh "
+         "Laxmi Shree Saraswati Annapurna Gandaki Koshi Bagmati Mahakali Sunrise Golden Royal New Star Unique "
+         "Mountain Valley River Green Mega Global National United Classic Modern").split()
+KINDS = ["Traders", "Suppliers", "Enterprises", "Distributors", "Trading", "Suppliers Pvt Ltd", "Pvt. Ltd.", ""]
+DISTRIBUTOR_HEADERS = ["Distributors", 'Distributor Email Address "TO"', 'Ncell Email address "CC"',
+                       "Subject", "Body", "Regards"]
+REVENUE_HEADERS = ["S.N.", "Distributor Name", "Package Number", "Ecare Month", "Amount", "Remarks"]
+
+
+# Synthetic data
+
+def make_name(rng):
+    return " ".join(rng.sample(WORDS, rng.randint(2, 3)) + [rng.choice(KINDS)]).strip()
+
+
+def add_noise(rng, name):
+    """One random typo or formatting change of the kind seen in real revenue sheets"""
+    kind = rng.randrange(5)
+    if kind == 0:
+        return name.upper() if rng.random() < 0.5 else name.lower()
+    if kind == 1 and len(name) > 3:
+        i = rng.randrange(len(name))
+        return name[:i] + name[i + 1:]
+    if kind == 2 and len(name) > 3:
+        i = rng.randrange(len(name) - 1)
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    if kind == 3:
+        return name + rng.choice([" Pvt Ltd", " Pvt. Ltd.", " Traders"])
+    return "  ".join(name.split())
+
+
+def generate(directory, distributors=200, files=10, rows=2000, noise=0.2, formats=("xlsx", "csv"),
+             match_rate=0.5, seed=1):
+    """Write dist.csv and a revenue/ folder under directory; returns their paths"""
+    rng = random.Random(seed)
+    revenue_folder = os.path.join(directory, "revenue")
+    os.makedirs(revenue_folder, exist_ok=True)
+
+    names = []
+    seen = set()
+    while len(names) < distributors:
+        name = make_name(rng)
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+
+    distributor_path = os.path.join(directory, "dist.csv")
+    with open(distributor_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(DISTRIBUTOR_HEADERS)
+        for i, name in enumerate(names):
+            writer.writerow([name, f"dist{i}@example.com", "cc@example.com", "Revenue statement",
+                             "Please find your revenue statement attached.", "Finance Team"])
+
+    for file_idx in range(files):
+        month = f"2026-{file_idx % 12 + 1:02d}"
+        data = []
+        for row_idx in range(rows):
+            name = rng.choice(names) if rng.random() < match_rate else make_name(rng)
+            if rng.random() < noise:
+                name = add_noise(rng, name)
+            data.append([row_idx + 1, name, f"PKG-{rng.randint(1000, 9999)}", month,
+                         round(rng.uniform(100, 100000), 2), ""])
+        write_revenue_file(os.path.join(revenue_folder, f"revenue_{file_idx:03d}"),
+                           formats[file_idx % len(formats)], data)
+    return distributor_path, revenue_folder
+
+
+def write_revenue_file(stem, fmt, data):
+    if fmt == "csv":
+        with open(stem + ".csv", 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(REVENUE_HEADERS)
+            writer.writerows(data)
+    elif fmt == "xlsx":
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(REVENUE_HEADERS)
+        for row in data:
+            ws.append(row)
+        wb.save(stem + ".xlsx")
+    elif fmt == "xls":
+        import xlwt  # only needed to generate .xls test files
+        wb = xlwt.Workbook()
+        ws = wb.add_sheet("Sheet1")
+        for row_idx, row in enumerate([REVENUE_HEADERS] + data):
+            for col_idx, value in enumerate(row):
+                ws.write(row_idx, col_idx, value)
+        wb.save(stem + ".xls")
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+# Measurement
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None if it cannot be read"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def stage(seconds, items=None, unit="items", latencies=None, **extra):
+    result = {"seconds": round(seconds, 4)}
+    if items is not None:
+        result[unit] = items
+        result[f"{unit}_per_second"] = round(items / seconds, 1) if seconds else None
+    if latencies is not None:
+        result["p50_ms"] = round(percentile(latencies, 50) * 1000, 3) if latencies else None
+        result["p95_ms"] = round(percentile(latencies, 95) * 1000, 3) if latencies else None
+    result.update(extra)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+class MockTransport(Transport):
+    """Renders every message as MIME (like SMTP/eml would) and drops it, optionally waiting
+    `latency` seconds per message to imitate a mail server"""
+
+    name = "mock"
+
+    def __init__(self, latency=0.0, render=True):
+        self.latency = latency
+        self.render = render
+        self.sent = 0
+        self.bytes = 0
+
+    def send(self, message):
+        if self.render:
+            self.bytes += len(build_mime(message, "bench@example.com").as_bytes())
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent += 1
+
+
+def time_each(func, items):
+    latencies = []
+    results = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        results.append(func(item))
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latencies, results
+
+
+def time_startup(command, runs):
+    """Launch the app `runs` times with STARTUP_PROBE_FILE set, which makes it write its
+    time_to_first_window to that file and exit as soon as its window is drawn.
+
+    time_to_first_window starts once the interpreter runs automate.py, so only the wall time
+    includes interpreter start and, for a onefile build, the bootloader's unpack.
+    """
+    walls = []
+    windows = []
+    with tempfile.TemporaryDirectory() as probe_dir:
+        for run_no in range(runs):
+            probe_file = os.path.join(probe_dir, f"startup_{run_no}.txt")
+            env = dict(os.environ, STARTUP_PROBE_FILE=probe_file)
+            start = time.perf_counter()
+            subprocess.run(command, env=env, capture_output=True, timeout=120)
+            walls.append(time.perf_counter() - start)
+            if os.path.exists(probe_file):
+                with open(probe_file, encoding="utf-8") as f:
+                    windows.append(float(f.read()))
+    return stage(sum(walls), runs, "launches", walls,
+                 time_to_first_window_p50_ms=round(percentile(windows, 50) * 1000, 3) if windows else None,
+                 budget_ms=config.STARTUP_BUDGET_SECONDS * 1000)
+
+
+def run(args, workdir):
+    report = {
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "workdir", "keep")},
+        "platform": {"python": platform.python_version(), "system": platform.platform(),
+                     "cpus": os.cpu_count()},
+        "stages": {},
+    }
+    stages = report["stages"]
+
+    start = time.perf_counter()
+    distributor_path, revenue_folder = generate(workdir, args.distributors, args.files, args.rows, args.noise,
+                                                args.formats.split(","), args.match_rate, args.seed)
+    stages["generate"] = stage(time.perf_counter() - start, args.files, "files")
+
+    start = time.perf_counter()
+    distributors = load_distributors(distributor_path)
+    stages["load_distributors"] = stage(time.perf_counter() - start, len(distributors), "distributors")
+
+    start = time.perf_counter()
+    table = load_revenue_folder(revenue_folder, workers=1)
+    stages["ingest_serial"] = stage(time.perf_counter() - start, table.row_count, "rows", files=len(table))
+    if args.workers > 1:
+        start = time.perf_counter()
+        table = load_revenue_folder(revenue_folder, workers=args.workers)
+        stages["ingest_parallel"] = stage(time.perf_counter() - start, table.row_count, "rows",
+                                          workers=args.workers)
+
+    names = [distributor.name for distributor in distributors]
+    results = None
+    reference = None
+    for engine in args.engines.split(","):
+        if engine == "indexed":
+            start = time.perf_counter()
+            index = NameIndex(table)
+            stages["index_build"] = stage(time.perf_counter() - start, len(index), "distinct_names")
+            seconds, latencies, matches = time_each(index.find_matches, names)
+            extra = {}
+        elif engine == "scan":
+            seconds, latencies, matches = time_each(RevenueTable(table.files).find_matches, names)
+            extra = {}
+        elif engine.startswith("batch"):
+            # batch or batch:<backend>; latencies are per block of args.batch_size names
+            start = time.perf_counter()
+            scorer = BatchScorer(NameIndex(table), engine.partition(":")[2] or "auto")
+            build_seconds = time.perf_counter() - start
+            blocks = [names[i:i + args.batch_size] for i in range(0, len(names), args.batch_size)]
+            seconds, latencies, block_matches = time_each(scorer.find_matches_batch, blocks)
+            matches = [m for block in block_matches for m in block]
+            seconds += build_seconds
+            extra = {"backend": scorer.backend, "index_build_seconds": round(build_seconds, 4),
+                     "block_size": args.batch_size}
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+
+        key = [[(m['filepath'], m['row'], m['match_ratio']) for m in found] for found in matches]
+        if reference is None:
+            reference = key
+        else:
+            extra["differs_from_first_engine"] = sum(1 for a, b in zip(reference, key) if a != b)
+        stages[f"match_{engine}"] = stage(seconds, len(names), "distributors", latencies,
+                                          matched=sum(1 for m in matches if m), **extra)
+        if results is None:
+            results = list(zip(distributors, matches))
+
+    # Best row of one file for one distributor, as the preview pane asks for it
+    sample = names[:args.file_sample]
+    pairs = [(name, revenue_file) for name in sample for revenue_file in table.files]
+    seconds, latencies, _ = time_each(lambda pair: pair[1].best_match(pair[0]), pairs)
+    stages["find_match_in_file"] = stage(seconds, len(pairs), "lookups", latencies)
+
+    if args.send:
+        from sending import SendPipeline, TokenBucket
+
+        work_items = [(distributor, matches) for distributor, matches in results if matches]
+        transport = MockTransport(args.send_latency_ms / 1000.0)
+        pipeline = SendPipeline(transport, TokenBucket(0), config.SEND_PREPARE_WORKERS,
+                                extract_dir=os.path.join(workdir, "extracts") if args.extracts else None,
+                                extract_workers=args.workers)
+        latencies = []
+        failed = 0
+        start = last = time.perf_counter()
+        for _, error_msg, _ in pipeline.run(work_items):
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+            failed += error_msg is not None
+        stages["send"] = stage(time.perf_counter() - start, len(work_items), "messages", latencies,
+                               failed=failed, mime_bytes=transport.bytes, extracts=args.extracts)
+
+    if args.startup:
+        command = args.startup_command.split() if args.startup_command else \
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "automate.py")]
+        stages["startup"] = time_startup(command, args.startup)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark matching and sending on synthetic data.")
+    parser.add_argument("--distributors", type=int, default=200, help="distributors in the list")
+    parser.add_argument("--files", type=int, default=10, help="revenue files to generate")
+    parser.add_argument("--rows", type=int, default=2000, help="rows per revenue file")
+    parser.add_argument("--noise", type=float, default=0.2, help="share of revenue names with a typo (0-1)")
+    parser.add_argument("--match-rate", type=float, default=0.5, help="share of revenue rows naming a listed distributor")
+    parser.add_argument("--formats", default="xlsx,csv", help="comma-separated mix of xlsx, csv, xls (needs xlwt)")
+    parser.add_argument("--engines", default="indexed,batch",
+                        help="comma-separated matching engines to time: indexed, scan (slow), batch, "
+                             "batch:rapidfuzz, batch:trigram, batch:python")
+    parser.add_argument("--batch-size", type=int, default=64, help="names per call for batch engines")
+    parser.add_argument("--workers", type=int, default=config.INGEST_WORKERS, help="processes for parallel ingestion")
+    parser.add_argument("--file-sample", type=int, default=10, help="distributors timed per file for find_match_in_file")
+    parser.add_argument("--send", action="store_true", help="also time the send pipeline with a mock transport")
+    parser.add_argument("--send-latency-ms", type=float, default=0.0, help="simulated server time per message")
+    parser.add_argument("--extracts", action="store_true", help="send per-distributor extracts")
+    parser.add_argument("--startup", type=int, default=0, metavar="N",
+                        help="also launch the app N times and time its first window (needs a display)")
+    parser.add_argument("--startup-command", help="command to launch instead of automate.py, e.g. the built exe")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="where to generate data (default: a temporary folder)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary folder with the generated data")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="outlook_bench_")
+    try:
+        report = run(args, workdir)
+    finally:
+        # Only a temporary folder is removed; an explicit --workdir is left alone
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Headless batch entry point: match distributors against the revenue folder, write a
+report and optionally send the mails, without importing tkinter.
+
+    python cli.py --report matches.csv
+    python cli.py --distributors list.xlsx --revenue D:/revenue --report out.json --send --transport smtp
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import multiprocessing
+
+import config
+from distributors import load_distributors
+from scoring import build_matcher
+from parse_cache import ParseCache
+from revenue import RevenueTable, load_revenue_files, list_revenue_files
+from stats import NULL_STATS, RunStats
+
+EXIT_OK = 0
+EXIT_SEND_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INPUT_ERROR = 3
+EXIT_NO_MATCHES = 4
+
+REPORT_FIELDS = ["id", "name", "email", "status", "files", "commission", "month", "match_ratio", "send_status", "send_detail"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Match distributors to revenue files and optionally email them.")
+    parser.add_argument("--distributors", default=config.DISTRIBUTOR_DATA, help="distributor list (.csv/.xlsx/.xls)")
+    parser.add_argument("--revenue", default=config.REVENUE_FOLDER, help="folder of revenue files")
+    parser.add_argument("--report", help="write the match report here (.csv or .json)")
+    parser.add_argument("--format", choices=["csv", "json"], help="report format (default: from --report extension)")
+    parser.add_argument("--send", action="store_true", help="email every matched distributor")
+    parser.add_argument("--extracts", action="store_true", default=config.SEND_EXTRACTS,
+                        help="attach only each distributor's rows instead of the full revenue files")
+    parser.add_argument("--journal", default=config.SEND_JOURNAL,
+                        help="send journal used to skip distributors already sent to ('' disables it)")
+    parser.add_argument("--transport", default=None, help="mail transport for --send: smtp, eml or outlook")
+    parser.add_argument("--workers", type=int, default=config.INGEST_WORKERS, help="revenue parsing processes")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the parsed revenue file cache")
+    parser.add_argument("--stats", action="store_true", help="print stage timings and counters when done")
+    parser.add_argument("--profile", metavar="DIR", help="dump a cProfile of the run into DIR")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    return parser
+
+
+def log(args, msg):
+    if not args.quiet:
+        print(msg, file=sys.stderr)
+
+
+def match_all(distributors, folder, workers, cache, on_error, stats=NULL_STATS, layouts=None):
+    with stats.timer("read_parse"):
+        paths = list_revenue_files(folder)
+        loaded = load_revenue_files(paths, on_error=on_error, cache=cache, workers=workers, layouts=layouts)
+    table = RevenueTable([revenue_file for revenue_file in loaded if revenue_file is not None])
+    stats.count("files_seen", len(paths))
+    with stats.timer("index_build"):
+        matcher = build_matcher(table, config.MATCH_ENGINE, config.SCORING_BACKEND)
+    with stats.timer("similarity"):
+        matches = matcher.find_matches_batch([distributor.name for distributor in distributors])
+    results = list(zip(distributors, matches))
+    stats.count("comparisons", matcher.comparisons)
+    stats.count("rows_indexed", table.row_count)
+    return table, results
+
+
+def report_rows(results):
+    rows = []
+    for distributor, matches in results:
+        row = {
+            "id": distributor.id,
+            "name": distributor.name,
+            "email": distributor.email,
+            "status": "MATCHED" if matches else "NO MATCH",
+            "files": ";".join(os.path.basename(m['filepath']) for m in matches),
+            "commission": matches[0].get('commission', '') if matches else "",
+            "month": matches[0].get('month', '') if matches else "",
+            "match_ratio": round(matches[0]['match_ratio'], 4) if matches else "",
+            "send_status": "",
+            "send_detail": "",
+        }
+        rows.append(row)
+    return rows
+
+
+def write_report(path, rows, fmt=None):
+    fmt = fmt or ("json" if path.lower().endswith(".json") else "csv")
+    if fmt == "json":
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False, default=str)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def send_matched(args, results, rows, stats=NULL_STATS, layouts=None):
+    # Only pulled in when sending, so plain matching runs never load smtplib/email or COM
+    from sending import SendPipeline, TokenBucket
+    from templates import MessageRenderer
+    from transport import create_transport
+
+    work_items = []
+    row_by_id = {}
+    for (distributor, matches), row in zip(results, rows):
+        if matches:
+            work_items.append((distributor, matches))
+            row_by_id[distributor.id] = row
+
+    bucket = TokenBucket(config.SEND_RATE_PER_MINUTE / 60.0, config.SEND_BURST)
+    pipeline = SendPipeline(create_transport(args.transport), bucket, config.SEND_PREPARE_WORKERS,
+                            extract_dir=config.EXTRACT_DIR if args.extracts else None,
+                            extract_workers=args.workers, journal_path=args.journal or None,
+                            retry_attempts=config.SEND_RETRY_ATTEMPTS,
+                            retry_base_seconds=config.SEND_RETRY_BASE_SECONDS, stats=stats,
+                            renderer=MessageRenderer(config.RENDER_CACHE_SIZE, config.HTML_BODIES),
+                            check_dns=config.RECIPIENT_DNS_CHECK, layouts=layouts)
+    failed = 0
+    for distributor, error_msg, detail in pipeline.run(work_items):
+        row = row_by_id[distributor.id]
+        row["send_status"] = "SENT" if error_msg is None else "FAILED"
+        row["send_detail"] = detail
+        if error_msg is not None:
+            failed += 1
+            print(f"Send failed: {distributor.name} - {error_msg}", file=sys.stderr)
+        else:
+            log(args, f"Sent: {distributor.name}")
+    return len(work_items) - failed, failed
+
+
+def run(args, stats):
+    if not os.path.isfile(args.distributors):
+        print(f"Distributor file not found: {args.distributors}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+    if not os.path.isdir(args.revenue):
+        print(f"Revenue folder not found: {args.revenue}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+
+    try:
+        with stats.timer("load_distributors"):
+            distributors = load_distributors(args.distributors)
+    except Exception as e:
+        print(f"Could not load distributor file: {e}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+    log(args, f"Loaded {len(distributors)} distributors.")
+
+    cache = None if args.no_cache else ParseCache(config.PARSE_CACHE_DIR, config.PARSE_CACHE_MAX_BYTES)
+    # Layouts are kept even with --no-cache: they only say where each file version's header
+    # rows are, and spare re-detecting them when files are parsed or split into extracts
+    layouts = ParseCache(config.LAYOUT_CACHE_DIR, config.LAYOUT_CACHE_MAX_BYTES)
+    table, results = match_all(distributors, args.revenue, args.workers, cache,
+                               on_error=lambda path, e: print(f"Error reading {path}: {e}", file=sys.stderr),
+                               stats=stats, layouts=layouts)
+    if cache is not None:
+        stats.count("cache_hits", cache.hits)
+    rows = report_rows(results)
+    matched_count = sum(1 for _, matches in results if matches)
+    log(args, f"Done. {matched_count}/{len(distributors)} matched ({len(table)} files, {table.row_count} rows).")
+
+    exit_code = EXIT_OK if matched_count else EXIT_NO_MATCHES
+    if args.send and matched_count:
+        try:
+            sent, failed = send_matched(args, results, rows, stats, layouts)
+        except Exception as e:
+            print(f"Sending stopped: {e}", file=sys.stderr)
+            exit_code = EXIT_SEND_FAILED
+        else:
+            log(args, f"Email sending complete. {sent} sent, {failed} failed")
+            if failed:
+                exit_code = EXIT_SEND_FAILED
+
+    if args.report:
+        write_report(args.report, rows, args.format)
+        log(args, f"Report written to {args.report}")
+    return exit_code
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if config.COLLECT_STATS or args.stats or args.profile:
+        stats = RunStats("cli", args.profile)
+    else:
+        stats = NULL_STATS
+    with stats.profiling():
+        exit_code = run(args, stats)
+
+    if stats.enabled:
+        stats.finish()
+        try:
+            stats.write(config.STATS_LOG)
+        except OSError as e:
+            print(f"Could not write run stats: {e}", file=sys.stderr)
+        if args.stats:
+            print(stats.summary(), file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
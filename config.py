@@ -1,9 +1,103 @@
 import os
+import sys
 
 # Configuration settings
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if getattr(sys, 'frozen', False):
+    # A onefile build runs from a temporary folder that is deleted when the app exits, so the
+    # journal, caches and logs live next to the executable instead
+    BASE_DIR = os.path.dirname(os.path.abspath(sys.executable))
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DISTRIBUTOR_DATA = os.path.join(BASE_DIR, 'data', 'distributor_data.csv')
 REVENUE_FOLDER = os.path.join(BASE_DIR, 'data', 'revenue')
 
+# Parsed revenue files are cached here, keyed by path, size and mtime
+PARSE_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'cache')
+PARSE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Detected layouts (sheets with a distributor column and their header rows) per file version,
+# used when parsing and when splitting extracts; unlike the parse cache, Clear Cache and
+# --no-cache leave it in place
+LAYOUT_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'cache', 'layouts')
+LAYOUT_CACHE_MAX_BYTES = 5 * 1024 * 1024
+
+# How often the Auto-refresh option polls the revenue folder and distributor file
+WATCH_INTERVAL_MS = 5000
+
+# Rendered file/email previews kept for instant re-selection
+PREVIEW_CACHE_SIZE = 256
+
+# Rendered subjects/bodies kept for the preview pane and the sends that follow it.
+# Subject, Body and Regards may use {name}, {email}, {cc}, {month}, {commission}, {files}
+# and {file_count}; a Body containing HTML tags is sent as HTML.
+RENDER_CACHE_SIZE = 4096
+
+# Worker processes used to parse revenue files; 1 parses serially in the app process
+INGEST_WORKERS = max(1, min(8, (os.cpu_count() or 1) - 1))
+
 # Create folders if they don't exist
-os.makedirs(REVENUE_FOLDER, exist_ok=True)
\ No newline at end of file
+os.makedirs(REVENUE_FOLDER, exist_ok=True)
+
+# Matching engine: "batch" (default), "indexed", "scan" (brute-force reference) or
+# "compare" (run indexed and scan and report any difference)
+MATCH_ENGINE = "batch"
+
+# Candidate scoring for the "batch" engine: "auto" (rapidfuzz if installed, otherwise
+# pure Python; both give the same results as "indexed"), "rapidfuzz", "python", or
+# "trigram" (NumPy/SciPy trigram cosine; fastest, but may miss low-overlap matches)
+SCORING_BACKEND = os.environ.get('SCORING_BACKEND', 'auto')
+
+# Bulk sending: submissions are limited to SEND_RATE_PER_MINUTE (bursts of up to
+# SEND_BURST); SEND_PREPARE_WORKERS threads build messages ahead of the transport
+SEND_RATE_PER_MINUTE = 120
+SEND_BURST = 5
+SEND_PREPARE_WORKERS = 4
+
+# Mail transport: "outlook" (desktop Outlook via COM), "smtp", or "eml" (write .eml
+# files to EML_OUTPUT_DIR instead of sending)
+MAIL_TRANSPORT = os.environ.get('MAIL_TRANSPORT', 'outlook')
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '25'))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '0') == '1'
+SMTP_SSL = os.environ.get('SMTP_SSL', '0') == '1'
+SMTP_SENDER = os.environ.get('SMTP_SENDER')
+SMTP_MAX_PER_SESSION = 100
+EML_OUTPUT_DIR = os.path.join(BASE_DIR, 'data', 'outbox')
+
+# Attach per-distributor extracts (only the distributor's rows, written to EXTRACT_DIR)
+# instead of the full revenue files
+SEND_EXTRACTS = os.environ.get('SEND_EXTRACTS', '0') == '1'
+EXTRACT_DIR = os.path.join(BASE_DIR, 'data', 'extracts')
+
+# Bulk sends are recorded in this journal; re-running a batch skips everything already
+# sent. Transient send failures are retried SEND_RETRY_ATTEMPTS times, waiting
+# SEND_RETRY_BASE_SECONDS, then twice as long each time.
+SEND_JOURNAL = os.path.join(BASE_DIR, 'data', 'send_journal.sqlite3')
+SEND_RETRY_ATTEMPTS = 3
+SEND_RETRY_BASE_SECONDS = 30
+
+# On close, how long to wait for a running bulk send to stop and close its journal
+CLOSE_WAIT_MS = 15000
+
+# Bodies starting with <html> (or a doctype) are sent as HTML. With HTML_BODIES=1 so is any
+# body containing tags like <b> or <br>, with its line breaks kept as <br>; off by default,
+# as plain-text bodies in the list may contain such tags literally
+HTML_BODIES = os.environ.get('HTML_BODIES', '0') == '1'
+
+# Before a bulk send every recipient domain can also be looked up in DNS (one lookup per
+# domain); off by default since it needs network access and mail-only domains may fail it
+RECIPIENT_DNS_CHECK = os.environ.get('RECIPIENT_DNS_CHECK', '0') == '1'
+
+# Run stats: per-stage timings and counters of every match/send run are appended to
+# STATS_LOG (one JSON object per line) and shown under "Run Stats". Set PROFILE=1 to
+# also dump a cProfile of each run's worker into PROFILE_DIR.
+COLLECT_STATS = os.environ.get('COLLECT_STATS', '1') == '1'
+STATS_LOG = os.path.join(BASE_DIR, 'data', 'run_stats.jsonl')
+PROFILE_RUNS = os.environ.get('PROFILE', '0') == '1'
+PROFILE_DIR = os.path.join(BASE_DIR, 'data', 'profiles')
+
+# Time from launch to the first drawn window is logged as a "startup" run; a slower start
+# than this is flagged in the status bar
+STARTUP_BUDGET_SECONDS = 1.0
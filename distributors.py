@@ -0,0 +1,126 @@
+import os
+import hashlib
+
+from matching import normalize_name
+from revenue import iter_sheet
+
+FIELDS = ('name', 'email', 'cc', 'subject', 'body', 'regards')
+FIELD_HEADERS = ('Distributors', 'Distributor Email Address "TO"', 'Ncell Email address "CC"',
+                 'Subject', 'Body', 'Regards')
+
+
+class Distributor:
+    """One row of the distributor list.
+
+    id is derived from the row's contents (plus an occurrence counter for exact duplicates),
+    so it is unique within a list and stays the same across reloads until the row is edited.
+    """
+
+    __slots__ = ('id',) + FIELDS
+
+    def __init__(self, distributor_id, name, email, cc, subject, body, regards):
+        self.id = distributor_id
+        self.name = name
+        self.email = email
+        self.cc = cc
+        self.subject = subject
+        self.body = body
+        self.regards = regards
+
+    def __repr__(self):
+        return f"Distributor({self.id!r}, {self.name!r}, {self.email!r})"
+
+
+class DistributorStore:
+    """Distributor records with hash indexes by id, normalized name and email"""
+
+    def __init__(self, rows=()):
+        self.records = []
+        self.by_id = {}
+        self.by_name = {}
+        self.by_email = {}
+        seen = {}
+        for fields in rows:
+            fields = tuple(fields)
+            occurrence = seen.get(fields, 0)
+            seen[fields] = occurrence + 1
+            digest = hashlib.sha1("\x1f".join(fields).encode('utf-8')).hexdigest()[:12]
+            record = Distributor(f"{digest}-{occurrence}" if occurrence else digest, *fields)
+            self.records.append(record)
+            self.by_id[record.id] = record
+            self.by_name.setdefault(normalize_name(record.name), []).append(record)
+            for email in record.email.replace(',', ';').split(';'):
+                if email.strip():
+                    self.by_email.setdefault(email.strip().lower(), []).append(record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, distributor_id):
+        return self.by_id.get(distributor_id)
+
+    def find_by_name(self, name):
+        return list(self.by_name.get(normalize_name(name), []))
+
+    def find_by_email(self, email):
+        return list(self.by_email.get(str(email).strip().lower(), []))
+
+
+def _column_map(headers):
+    """Column index of each field in FIELDS order, resolved once per file.
+
+    Headers are matched exactly first, then ignoring case and surrounding spaces. Like
+    dict(zip(headers, row)), the last of duplicate headers wins.
+    """
+    exact = {}
+    loose = {}
+    for i, header in enumerate(headers):
+        if header is None:
+            continue
+        exact[header] = i
+        loose[str(header).strip().lower()] = i
+    return [exact.get(header, loose.get(header.lower())) for header in FIELD_HEADERS]
+
+
+def iter_distributor_rows(path):
+    """Yield one tuple of FIELDS per distributor row of a .csv/.xlsx/.xls list.
+
+    Every format goes through the same streaming reader (read-only openpyxl, on-demand xlrd,
+    buffered csv with encoding detection); only the mapped columns are read from each row,
+    empty cells become "", and fully blank rows are skipped. Repeated values (the shared
+    subject, body, regards and CC) are stored once.
+    """
+    ext = os.path.splitext(path)[-1].lower()
+    if ext not in (".csv", ".xlsx", ".xls"):
+        raise Exception("Unsupported file format")
+
+    rows = iter_sheet(path, data_only=True)
+    try:
+        headers = next(rows, None)
+        if headers is None:
+            return
+        columns = list(enumerate(_column_map(list(headers))))
+        shared = {}
+        for row in rows:
+            fields = [''] * len(FIELDS)
+            width = len(row)
+            for field_idx, col in columns:
+                if col is None or col >= width:
+                    continue
+                value = row[col]
+                if value is None:
+                    continue
+                text = value.strip() if value.__class__ is str else str(value).strip()
+                fields[field_idx] = shared.setdefault(text, text) if field_idx >= 2 else text
+            if any(fields):
+                yield tuple(fields)
+    finally:
+        rows.close()
+
+
+def load_distributors(path):
+    """Read the distributor list (.csv/.xlsx/.xls) into a DistributorStore"""
+    return DistributorStore(iter_distributor_rows(path))
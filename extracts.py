@@ -0,0 +1,159 @@
+import os
+import csv
+
+from parse_cache import MISS
+from revenue import scan_sheets
+
+
+def extract_path(directory, distributor, source_path):
+    """Where the extract of source_path for distributor is written.
+
+    Extracts keep the source file name (in a folder per distributor id) so recipients see the
+    same attachment name as before. Other formats are written as .xlsx appended to the full
+    name (jan.xls -> jan.xls.xlsx), so they can't collide with a jan.xlsx next to them.
+    """
+    name = os.path.basename(source_path)
+    if os.path.splitext(name)[1].lower() not in (".csv", ".xlsx"):
+        name += ".xlsx"
+    return os.path.join(directory, distributor.id, name)
+
+
+def write_sheets(out_path, sheets):
+    """Write (sheet name, headers, rows) sections as CSV or (write-only, streaming) xlsx,
+    depending on out_path; xlsx gets one worksheet per section. CSV sources only ever have
+    one section."""
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    if out_path.lower().endswith(".csv"):
+        _, headers, rows = sheets[0]
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+    else:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        for title, headers, rows in sheets:
+            ws = wb.create_sheet(title or None)
+            ws.append(list(headers))
+            for row in rows:
+                ws.append(list(row))
+        with open(tmp_path, 'wb') as f:
+            wb.save(f)
+    os.replace(tmp_path, out_path)
+
+
+def split_file(source_path, targets, layouts=None):
+    """Split one revenue file by distributor in a single pass.
+
+    targets maps a lowercased distributor name (as it appears in the file) to the extract
+    paths that should receive its rows. Every sheet with a distributor name column is
+    split, keeping its header row. Only rows of a target name are held, and each extract is
+    written once the pass is done. Returns {extract path: rows written}; empty if no sheet
+    has a distributor name column.
+
+    layouts (the ParseCache of layouts shared with parse_revenue_file) spares re-detecting
+    the header rows of every sheet on each send.
+    """
+    layout = layouts.get(source_path) if layouts is not None else MISS
+    if layout is not MISS and not layout:
+        return {}
+    buckets = {name: [] for name in targets}  # name -> [(sheet, headers, rows)]
+    found_layout = []
+    sheets = scan_sheets(source_path, None if layout is MISS else layout)
+    try:
+        for sheet, header_row, headers, name_col, rows in sheets:
+            found_layout.append((sheet, header_row))
+            found = {}
+            for row in rows:
+                value = row[name_col] if name_col < len(row) else None
+                key = '' if value is None else str(value).strip().lower()
+                if key in buckets:
+                    found.setdefault(key, []).append(row)
+            for name, matched in found.items():
+                buckets[name].append((sheet, headers, matched))
+    finally:
+        sheets.close()
+    if layouts is not None and layout is MISS:
+        layouts.put(source_path, tuple(found_layout))
+
+    written = {}
+    for name, out_paths in targets.items():
+        if not buckets[name]:
+            continue
+        for out_path in out_paths:
+            write_sheets(out_path, buckets[name])
+            written[out_path] = sum(len(rows) for _, _, rows in buckets[name])
+    return written
+
+
+def _split_or_error(source_path, targets, layouts=None):
+    try:
+        return split_file(source_path, targets, layouts)
+    except Exception as e:
+        return e
+
+
+def plan_extracts(work_items, directory):
+    """{source path: {lowercased name: [extract paths]}} for (distributor, matches) work items"""
+    plan = {}
+    for distributor, matches in work_items:
+        for match in matches:
+            name = str(match['name']).strip().lower()
+            out_path = extract_path(directory, distributor, match['filepath'])
+            plan.setdefault(match['filepath'], {}).setdefault(name, []).append(out_path)
+    return plan
+
+
+def build_extracts(work_items, directory, workers=1, on_error=None, checkpoint=lambda: None, layouts=None):
+    """Generate every distributor's extracts, one pass per revenue file.
+
+    Files are split serially or across a process pool, so the work grows with the total
+    number of rows rather than with distributors times file size. Returns
+    {distributor id: attachment paths} aligned with each item's matches; a file that could
+    not be split (on_error(path, exc) is called for failures) is attached whole. layouts is
+    passed on to split_file.
+    """
+    plan = plan_extracts(work_items, directory)
+    written = {}
+
+    def collect(source_path, result):
+        if isinstance(result, Exception):
+            if on_error:
+                on_error(source_path, result)
+        else:
+            written.update(result)
+
+    todo = list(plan.items())
+    if workers > 1 and len(todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                futures = {pool.submit(_split_or_error, source_path, targets, layouts): source_path
+                           for source_path, targets in todo}
+                for future in as_completed(futures):
+                    checkpoint()
+                    collect(futures[future], future.result())
+                todo = []
+            if layouts is not None:
+                layouts.evict()  # the pool's copies of layouts only kept their own totals
+        except (OSError, BrokenProcessPool):
+            pass  # workers could not be started or died; split in this process instead
+    for source_path, targets in todo:
+        checkpoint()
+        collect(source_path, _split_or_error(source_path, targets, layouts))
+
+    paths = {}
+    for distributor, matches in work_items:
+        resolved = []
+        for match in matches:
+            out_path = extract_path(directory, distributor, match['filepath'])
+            resolved.append(out_path if out_path in written else match['filepath'])
+        paths[distributor.id] = resolved
+    return paths
+
+
+def extract_attachments(distributor, matches, directory, layouts=None):
+    """Extract paths holding only distributor's rows of each matched file"""
+    return build_extracts([(distributor, matches)], directory, layouts=layouts)[distributor.id]
@@ -0,0 +1,161 @@
+import os
+import itertools
+
+from revenue import RevenueTable, list_revenue_files
+from scoring import build_matcher
+from stats import NULL_STATS
+
+
+def scan_folder(folder):
+    """{path: (size, mtime)} for the revenue files of folder, in listing order"""
+    signature = {}
+    for path in list_revenue_files(folder):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        signature[path] = (st.st_size, st.st_mtime_ns)
+    return signature
+
+
+class MatchState:
+    """Match results of the previous run, brought up to date by computing only the delta.
+
+    Per-file best matches are independent of every other file, so results are kept per
+    distributor name and per file: a new or changed revenue file is re-scored for every known
+    name against an index of just the changed files, a removed file is simply dropped, and
+    only names that were never matched before are scored against the whole folder.
+    update() yields the Treeview edits needed to reflect the new results.
+    """
+
+    def __init__(self, engine="indexed", backend="auto", batch_size=64):
+        self.engine = engine
+        self.backend = backend
+        self.batch_size = batch_size
+        self.reset()
+
+    def reset(self):
+        self.folder = None
+        self.files = {}       # path -> (signature, RevenueFile or None)
+        self.order = []       # revenue paths in folder listing order
+        self.per_name = {}    # distributor name -> {path: match_info}
+        self.rows = {}        # distributor id -> (position, match summary) as last shown
+
+    def signature(self):
+        return {path: sig for path, (sig, _) in self.files.items()}
+
+    def file_signature(self, path):
+        """(size, mtime) of path when it was last matched, or None"""
+        entry = self.files.get(path)
+        return entry[0] if entry else None
+
+    def table(self):
+        return RevenueTable([self.files[path][1] for path in self.order if self.files[path][1] is not None])
+
+    def _matcher(self, table):
+        return build_matcher(table, self.engine, self.backend)
+
+    def _match_batches(self, matcher, names, checkpoint, stats):
+        """Yield (name, matches) for names, scored batch_size names per matcher call"""
+        for start in range(0, len(names), self.batch_size):
+            checkpoint()
+            batch = names[start:start + self.batch_size]
+            with stats.timer("similarity"):
+                results = matcher.find_matches_batch(batch)
+            yield from zip(batch, results)
+
+    def update(self, folder, distributors, load_files, checkpoint=lambda: None, stats=NULL_STATS):
+        """Yield ('clear',), ('remove', id) and ('row', id, position, distributor, matches) events.
+
+        Rows are identified by distributor id, which only changes when the row is edited.
+
+        load_files(paths) returns RevenueFiles (or None) aligned with paths. If the update is
+        interrupted the state is discarded, and the next update starts with a 'clear'.
+        Time spent per stage and the comparisons made are recorded in stats.
+        """
+        try:
+            yield from self._update(folder, distributors, load_files, checkpoint, stats)
+        except BaseException:
+            self.reset()
+            raise
+
+    def _update(self, folder, distributors, load_files, checkpoint, stats):
+        if folder != self.folder:
+            self.reset()
+            self.folder = folder
+        if not self.rows:
+            yield ('clear',)
+
+        with stats.timer("scan_folder"):
+            current = scan_folder(folder)
+        changed = [path for path, sig in current.items() if path not in self.files or self.files[path][0] != sig]
+        removed = [path for path in self.files if path not in current]
+
+        for path in removed:
+            del self.files[path]
+        with stats.timer("read_parse"):
+            loaded = load_files(changed)
+        stats.count("files_seen", len(current))
+        stats.count("files_loaded", len(changed))
+        for path, revenue_file in zip(changed, loaded):
+            self.files[path] = (current[path], revenue_file)
+        self.order = list(current)
+        checkpoint()
+
+        # Forget names that left the list, then patch the remaining ones file by file
+        names = {distributor.name for distributor in distributors}
+        for name in [name for name in self.per_name if name not in names]:
+            del self.per_name[name]
+        stale = removed + changed
+        if stale:
+            for by_file in self.per_name.values():
+                for path in stale:
+                    by_file.pop(path, None)
+        changed_files = [self.files[path][1] for path in changed if self.files[path][1] is not None]
+        if changed_files and self.per_name:
+            with stats.timer("index_build"):
+                matcher = self._matcher(RevenueTable(changed_files))
+            for name, matches in self._match_batches(matcher, list(self.per_name), checkpoint, stats):
+                by_file = self.per_name[name]
+                for match_info in matches:
+                    by_file[match_info['filepath']] = match_info
+            stats.count("comparisons", matcher.comparisons)
+
+        live = {distributor.id for distributor in distributors}
+        for distributor_id in [distributor_id for distributor_id in self.rows if distributor_id not in live]:
+            del self.rows[distributor_id]
+            yield ('remove', distributor_id)
+
+        position = {path: i for i, path in enumerate(self.order)}
+        full_matcher = None
+        for pos, distributor in enumerate(distributors):
+            checkpoint()
+            name = distributor.name
+            if name not in self.per_name:
+                if full_matcher is None:
+                    with stats.timer("index_build"):
+                        full_matcher = self._matcher(self.table())
+                # Score this name together with the next unmatched ones in one batch
+                pending = {}
+                for upcoming in itertools.islice(distributors, pos, None):
+                    if upcoming.name not in self.per_name:
+                        pending[upcoming.name] = None
+                        if len(pending) == self.batch_size:
+                            break
+                for new_name, matches in self._match_batches(full_matcher, list(pending), checkpoint, stats):
+                    self.per_name[new_name] = {m['filepath']: m for m in matches}
+                stats.count("names_matched", len(pending))
+
+            # Same order as a full run: ratio descending, then folder listing order
+            matches = sorted(self.per_name[name].values(),
+                             key=lambda m: (-m['match_ratio'], position[m['filepath']]))
+            summary = (pos, tuple((m['filepath'], m['row'], m['match_ratio']) for m in matches))
+            if self.rows.get(distributor.id) != summary:
+                self.rows[distributor.id] = summary
+                yield ('row', distributor.id, pos, distributor, matches)
+        if full_matcher is not None:
+            stats.count("comparisons", full_matcher.comparisons)
+
+    @property
+    def matched_count(self):
+        return sum(1 for _, matches in self.rows.values() if matches)
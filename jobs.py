@@ -0,0 +1,142 @@
+import time
+import queue
+import threading
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """A long-running operation executed on a worker thread.
+
+    The worker function receives the job and talks to the UI only through progress(), emit()
+    and the callbacks, which the JobRunner invokes on the Tk thread. It should call checkpoint()
+    between units of work so pause/resume and cancel take effect promptly.
+    """
+
+    def __init__(self, name, target, on_progress=None, on_item=None, on_done=None, on_error=None):
+        self.name = name
+        self.target = target
+        self.on_progress = on_progress
+        self.on_item = on_item
+        self.on_done = on_done
+        self.on_error = on_error
+        self.runner = None
+        self.thread = None
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def checkpoint(self):
+        """Block while paused; raise JobCancelled once cancel() has been called"""
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def sleep(self, seconds):
+        """Interruptible sleep: returns early (via JobCancelled) if the job is cancelled"""
+        if self._cancelled.wait(seconds):
+            raise JobCancelled()
+
+    def progress(self, done, total, text=""):
+        self.runner.post(self, 'progress', (done, total, text))
+
+    def emit(self, item):
+        self.runner.post(self, 'item', item)
+
+    def _run(self):
+        try:
+            result = self.target(self)
+        except JobCancelled:
+            self.runner.post(self, 'done', None)
+        except Exception as e:
+            self.runner.post(self, 'error', e)
+        else:
+            self.runner.post(self, 'done', result)
+
+
+class JobRunner:
+    """Runs Jobs on daemon threads and delivers their messages on the Tk thread.
+
+    Messages go through a thread-safe queue that root.after drains in small time slices,
+    so a burst of results never holds the event loop for more than about one frame.
+    """
+
+    def __init__(self, root, interval_ms=15, budget_s=0.012):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.budget_s = budget_s
+        self.queue = queue.Queue()
+        self.jobs = set()
+        self._scheduled = False
+
+    def submit(self, job):
+        job.runner = self
+        self.jobs.add(job)
+        job.thread = threading.Thread(target=job._run, name=f"job-{job.name}", daemon=True)
+        job.thread.start()
+        self._schedule()
+        return job
+
+    def post(self, job, kind, payload):
+        self.queue.put((job, kind, payload))
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    def _schedule(self):
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        self._scheduled = False
+        deadline = time.perf_counter() + self.budget_s
+        while time.perf_counter() < deadline:
+            try:
+                job, kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._dispatch(job, kind, payload)
+        if self.jobs or not self.queue.empty():
+            self._schedule()
+
+    def _dispatch(self, job, kind, payload):
+        if kind in ('done', 'error'):
+            self.jobs.discard(job)
+        callback = {
+            'progress': job.on_progress,
+            'item': job.on_item,
+            'done': job.on_done,
+            'error': job.on_error,
+        }[kind]
+        if callback is None:
+            return
+        if kind == 'progress':
+            callback(*payload)
+        else:
+            callback(payload)
@@ -0,0 +1,84 @@
+import os
+import time
+import hashlib
+import sqlite3
+
+SENT = "sent"
+FAILED = "failed"
+
+
+def journal_key(recipient, month, digests):
+    """Identity of one mailing: who, for which month, with which revenue data.
+
+    recipient must stay the same when a row's subject, body or CC is edited between runs
+    (SendPipeline uses the normalized name and TO addresses), or a resumed batch re-sends.
+    """
+    raw = "\x1f".join([recipient, str(month)] + sorted(digests))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class SendJournal:
+    """Durable record of bulk sends, so an interrupted batch can be resumed without duplicates.
+
+    Backed by SQLite in WAL mode. Each send is one row keyed by journal_key(). A SENT row is
+    committed at once, since losing it means mailing that distributor again on resume; other
+    records are batched every `commit_every` records or `commit_seconds`, and always on close.
+    A connection belongs to the thread that opened the journal.
+    """
+
+    def __init__(self, path, commit_every=10, commit_seconds=1.0):
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_seconds = commit_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS sends (
+            key TEXT PRIMARY KEY,
+            distributor_id TEXT NOT NULL,
+            month TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            detail TEXT,
+            updated REAL NOT NULL)""")
+        self.conn.commit()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def status(self, key):
+        row = self.conn.execute("SELECT status FROM sends WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def completed(self, key):
+        return self.status(key) == SENT
+
+    def record(self, key, distributor_id, month, status, detail=""):
+        self.conn.execute("""INSERT INTO sends (key, distributor_id, month, status, attempts, detail, updated)
+                             VALUES (?, ?, ?, ?, 1, ?, ?)
+                             ON CONFLICT(key) DO UPDATE SET status = excluded.status,
+                                 attempts = attempts + 1, detail = excluded.detail, updated = excluded.updated""",
+                          (key, distributor_id, str(month), status, detail, time.time()))
+        self.uncommitted += 1
+        if status == SENT or self.uncommitted >= self.commit_every or time.monotonic() - self.last_commit >= self.commit_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.uncommitted:
+            self.conn.commit()
+            self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
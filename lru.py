@@ -0,0 +1,34 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Small in-memory mapping that forgets the least recently used entry beyond maxsize"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        try:
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def discard(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
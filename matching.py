@@ -0,0 +1,157 @@
+import re
+from difflib import SequenceMatcher
+
+from revenue import MATCH_THRESHOLD
+
+SUFFIX_TOKENS = {"pvt", "private", "ltd", "limited", "traders", "trader", "trading", "co", "company", "inc"}
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+
+
+def normalize_name(name):
+    """Lowercase, drop punctuation, collapse whitespace and strip trailing "Pvt Ltd"/"Traders" style suffixes"""
+    tokens = _PUNCT_RE.sub(" ", str(name).lower()).split()
+    while len(tokens) > 1 and tokens[-1] in SUFFIX_TOKENS:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def _ratio(matches, length):
+    # Same formula as difflib's _calculate_ratio, so bounds compare exactly with ratio()
+    if length:
+        return 2.0 * matches / length
+    return 1.0
+
+
+def _quick_matches(name, target_counts):
+    """Character-multiset overlap; the numerator of SequenceMatcher.quick_ratio"""
+    avail = {}
+    matches = 0
+    for ch in name:
+        n = avail[ch] if ch in avail else target_counts.get(ch, 0)
+        avail[ch] = n - 1
+        if n > 0:
+            matches += 1
+    return matches
+
+
+class NameIndex:
+    """Blocked index over the distributor names of a RevenueTable.
+
+    Each distinct (lowercased) name is stored once with the first row it appears on in every
+    file, bucketed by length, plus a normalized-name lookup. A query only computes the full
+    SequenceMatcher ratio for names whose length and character-multiset upper bounds can
+    still beat the threshold, and gives exactly the same results as RevenueTable.find_matches.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.names = []         # distinct lowercased names
+        self.postings = []      # per name: {file index: first row index}
+        self.exact = {}         # lowercased name -> name id
+        self.normalized = {}    # normalized name -> [name ids]
+        self.by_length = {}     # len(name) -> [name ids]
+        self.comparisons = 0    # full SequenceMatcher ratios computed, for run stats
+
+        for file_idx, revenue_file in enumerate(table.files):
+            for row_idx, name in enumerate(revenue_file.lower_names):
+                name_id = self.exact.get(name)
+                if name_id is None:
+                    name_id = len(self.names)
+                    self.exact[name] = name_id
+                    self.names.append(name)
+                    self.postings.append({})
+                    self.normalized.setdefault(normalize_name(name), []).append(name_id)
+                    self.by_length.setdefault(len(name), []).append(name_id)
+                self.postings[name_id].setdefault(file_idx, row_idx)
+
+        self.lengths = sorted(self.by_length)
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, target, threshold=MATCH_THRESHOLD):
+        """Yield (name id, ratio) for every distinct name scoring above threshold.
+
+        Only an identical name scores 1.0, so an exact hit settles the files it appears in;
+        the rest are searched only if it is missing from some file, since those files still
+        need their best fuzzy match.
+        """
+        exact_id = self.exact.get(target)
+        if exact_id is not None and 1.0 > threshold:
+            yield exact_id, 1.0
+            if len(self.postings[exact_id]) == len(self.table.files):
+                return
+
+        seen = {exact_id}
+        matcher = SequenceMatcher(None, "", target)
+        target_len = len(target)
+        target_counts = {}
+        for ch in target:
+            target_counts[ch] = target_counts.get(ch, 0) + 1
+
+        def score(name_id):
+            name = self.names[name_id]
+            total = len(name) + target_len
+            if _ratio(_quick_matches(name, target_counts), total) <= threshold:
+                return None
+            self.comparisons += 1
+            matcher.set_seq1(name)
+            ratio = matcher.ratio()
+            if ratio > threshold:
+                return ratio
+            return None
+
+        # Normalized-exact hits are the likeliest winners; score them first
+        for name_id in self.normalized.get(normalize_name(target), []):
+            if name_id in seen:
+                continue
+            seen.add(name_id)
+            ratio = score(name_id)
+            if ratio is not None:
+                yield name_id, ratio
+
+        for length in self.lengths:
+            # real_quick_ratio bound: only lengths close enough to target can pass
+            if _ratio(min(length, target_len), length + target_len) <= threshold:
+                continue
+            for name_id in self.by_length[length]:
+                if name_id in seen:
+                    continue
+                ratio = score(name_id)
+                if ratio is not None:
+                    yield name_id, ratio
+
+    def file_matches(self, scored):
+        """Per-file best matches, highest ratio first, from (name id, ratio) pairs in any order"""
+        best = {}  # file index -> (ratio, row index)
+        for name_id, ratio in scored:
+            for file_idx, row_idx in self.postings[name_id].items():
+                current = best.get(file_idx)
+                if current is None or ratio > current[0] or (ratio == current[0] and row_idx < current[1]):
+                    best[file_idx] = (ratio, row_idx)
+
+        matches = [self.table.files[file_idx].match_info(row_idx, ratio)
+                   for file_idx, (ratio, row_idx) in sorted(best.items())]
+        matches.sort(key=lambda x: x['match_ratio'], reverse=True)
+        return matches
+
+    def find_matches(self, target_name, threshold=MATCH_THRESHOLD):
+        """Per-file best matches above threshold, highest ratio first (same as RevenueTable.find_matches)"""
+        return self.file_matches(self.candidates(target_name.lower(), threshold))
+
+    def find_matches_batch(self, target_names, threshold=MATCH_THRESHOLD):
+        return [self.find_matches(name, threshold) for name in target_names]
+
+
+def compare_engines(table, index, names, threshold=MATCH_THRESHOLD):
+    """Run the brute-force scan and the index side by side; returns [(name, scan, indexed)] that differ"""
+    def key(matches):
+        return [(m['filepath'], m['row'], m['match_ratio']) for m in matches]
+
+    mismatches = []
+    for name in names:
+        scanned = key(table.find_matches(name, threshold))
+        indexed = key(index.find_matches(name, threshold))
+        if scanned != indexed:
+            mismatches.append((name, scanned, indexed))
+    return mismatches
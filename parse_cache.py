@@ -0,0 +1,109 @@
+import os
+import pickle
+import hashlib
+import tempfile
+
+CACHE_VERSION = 3
+CACHE_SUFFIX = ".pkl"
+EVICT_TO = 0.9  # put() evicts down to this share of max_bytes, leaving room for more puts
+MISS = object()
+
+
+class ParseCache:
+    """On-disk cache of parsed revenue files (or their layouts), keyed by path, size and mtime.
+
+    Entries are pickles in a flat directory. Reads touch the entry's mtime so eviction
+    (oldest mtime first, once the directory grows past max_bytes) is least-recently-used.
+    The directory is listed once per instance; after that put() keeps a running total and
+    only scans again when it goes over max_bytes. Copies in worker processes count only
+    their own writes, so whoever fans out puts should evict() once afterwards.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = None  # running size of the directory, None until first listed
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, path):
+        st = os.stat(path)
+        raw = f"{CACHE_VERSION}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+        return os.path.join(self.directory, hashlib.sha1(raw.encode('utf-8')).hexdigest() + CACHE_SUFFIX)
+
+    def get(self, path):
+        """Cached value for path, or MISS if the file is new or has changed"""
+        try:
+            entry = self._entry_path(path)
+            with open(entry, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(entry)
+        except Exception:
+            self.misses += 1
+            return MISS
+        self.hits += 1
+        return value
+
+    def put(self, path, value):
+        tmp = None
+        try:
+            entry = self._entry_path(path)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, entry)
+            written = os.path.getsize(entry)
+        except Exception:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        if self.total_bytes is None:
+            self.total_bytes = self.size()
+        else:
+            self.total_bytes += written  # overcounts a replaced entry; evict() corrects it
+        if self.total_bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX):
+                entry = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target=None):
+        """Drop least recently used entries until the cache fits in target (max_bytes)"""
+        if target is None:
+            target = self.max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            total -= size
+        self.total_bytes = total
+
+    def clear(self):
+        """Remove every cached entry; returns how many were deleted"""
+        removed = 0
+        for _, _, entry in self._entries():
+            try:
+                os.remove(entry)
+                removed += 1
+            except OSError:
+                pass
+        self.total_bytes = None
+        return removed
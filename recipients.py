@@ -0,0 +1,183 @@
+import re
+from functools import lru_cache
+
+from stats import NULL_STATS
+
+# RFC 5321/5322 dot-atom local part and LDH domain labels; quoted local parts are not accepted
+_LOCAL_RE = re.compile(r"^[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*$")
+_LABEL_RE = re.compile(r"^[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?$")
+_TLD_RE = re.compile(r"^([A-Za-z]{2,63}|xn--[A-Za-z0-9-]{1,59})$")
+
+
+@lru_cache(maxsize=4096)
+def domain_problem(domain, check_dns=False):
+    """Why a (lower-case) domain can't receive mail, or None. Cached: lists reuse few domains"""
+    if len(domain) > 253:
+        return "domain is too long"
+    labels = domain.split(".")
+    if len(labels) < 2:
+        return "domain has no dot"
+    if not all(_LABEL_RE.match(label) for label in labels):
+        return "invalid domain"
+    if not _TLD_RE.match(labels[-1]):
+        return "invalid top-level domain"
+    if check_dns:
+        import socket
+        try:
+            socket.getaddrinfo(domain, None)
+        except OSError:
+            return "domain does not resolve"
+    return None
+
+
+@lru_cache(maxsize=65536)
+def address_problem(address, check_dns=False):
+    """Why an address is not a valid plain email address, or None"""
+    if not address:
+        return "no address"
+    if len(address) > 254:
+        return "address is too long"
+    local, at, domain = address.rpartition("@")
+    if not at or not local:
+        return "missing @"
+    if not domain:
+        return "missing domain"
+    if len(local) > 64 or not _LOCAL_RE.match(local):
+        return "invalid name before @"
+    return domain_problem(domain.lower(), check_dns)
+
+
+def split_addresses(addresses):
+    """The entries of a TO/CC field, which may separate them with ';' or ','.
+
+    Fields with display names are parsed with getaddresses, so a quoted name may contain
+    either separator ('"Doe, John" <j@x.com>'); entries come back as '"Name" <address>'.
+    """
+    if not addresses:
+        return []
+    if '<' not in addresses and '"' not in addresses:
+        return [a.strip() for a in re.split(r"[;,]", addresses) if a.strip()]
+    from email.utils import getaddresses  # not at module level: email is kept out of startup
+    entries = []
+    for name, address in getaddresses([addresses.replace(";", ",")]):
+        if name:
+            name = name.replace("\\", "\\\\").replace('"', '\\"')
+            entries.append(f'"{name}" <{address}>')
+        elif address:
+            entries.append(address)
+    return entries
+
+
+def bare_address(entry):
+    """The address part of an entry, dropping a display name ("Name <a@x.com>" -> "a@x.com")"""
+    if '<' not in entry:
+        return entry
+    from email.utils import parseaddr  # not at module level: email is kept out of startup
+    return parseaddr(entry)[1] or entry
+
+
+def entry_problem(entry, check_dns=False):
+    """Why one TO/CC entry (address, optionally with a display name) is invalid, or None"""
+    return address_problem(bare_address(entry), check_dns)
+
+
+def list_problem(addresses, check_dns=False):
+    """Why a TO field can't be sent to (no entries, or the first invalid one), or None"""
+    if not addresses or not isinstance(addresses, str):
+        return "no address"
+    entries = split_addresses(addresses)
+    if not entries:
+        return "no address"
+    for entry in entries:
+        problem = entry_problem(entry, check_dns)
+        if problem:
+            return f"{entry}: {problem}" if len(entries) > 1 else problem
+    return None
+
+
+def is_valid_email(email):
+    """Syntax check of a TO field: every ';'/','-separated entry must be a valid address.
+
+    Checks are memoized, so repeated TO/CC addresses cost a dict lookup.
+    """
+    return list_problem(email) is None
+
+
+@lru_cache(maxsize=4096)
+def clean_email_list(emails):
+    """Clean and validate a list of emails (for CC field); returns the valid entries joined by ';'"""
+    if not emails:
+        return ""
+    return ";".join(entry for entry in split_addresses(emails) if entry_problem(entry) is None)
+
+
+class RecipientReport:
+    """Outcome of a pre-flight check: problems maps distributor id -> reason the send would fail.
+
+    warnings maps distributor id -> CC entries that were dropped for bad syntax (they are
+    left off the message, as they always have been, rather than failing it).
+    """
+
+    def __init__(self):
+        self.problems = {}
+        self.warnings = {}
+        self.addresses = 0
+        self.unresolved = set()
+
+    def __bool__(self):
+        return not self.problems
+
+    def summary(self, distributors, limit=10):
+        """Short multi-line text listing the rejected distributors"""
+        return self._lines(distributors, self.problems, limit)
+
+    def warning_summary(self, distributors, limit=10):
+        """Short multi-line text listing the CC entries that will be left off"""
+        dropped = {i: "CC dropped: " + "; ".join(entries) for i, entries in self.warnings.items()}
+        return self._lines(distributors, dropped, limit)
+
+    @staticmethod
+    def _lines(distributors, reasons, limit):
+        by_id = {distributor.id: distributor for distributor in distributors}
+        lines = [f"{by_id[i].name}: {reason}" for i, reason in reasons.items()]
+        if len(lines) > limit:
+            lines = lines[:limit] + [f"... and {len(lines) - limit} more"]
+        return "\n".join(lines)
+
+
+def check_recipients(distributors, transport=None, check_dns=False, stats=NULL_STATS):
+    """Check every TO and CC address of a batch once, before any message is built.
+
+    Addresses are syntax-checked (memoized per address and per domain), then every distinct
+    address that passed is resolved through the transport in one batch when it can do so
+    (Outlook's address book; an open transport is required).
+    """
+    report = RecipientReport()
+    recipients = {}  # distributor id -> addresses that must resolve
+    for distributor in distributors:
+        email = distributor.email
+        problem = list_problem(email, check_dns)
+        if problem:
+            report.problems[distributor.id] = f"Invalid email: {email} ({problem})"
+            continue
+        kept = []
+        dropped = []
+        for entry in split_addresses(distributor.cc):
+            # Same rule as clean_email_list, which builds the CC line that is actually sent
+            (dropped if entry_problem(entry) else kept).append(entry)
+        if dropped:
+            report.warnings[distributor.id] = dropped
+        recipients[distributor.id] = [bare_address(entry) for entry in split_addresses(email) + kept]
+
+    unique = {address for addresses in recipients.values() for address in addresses}
+    report.addresses = len(unique)
+    if transport is not None and unique:
+        with stats.timer("resolve_recipients"):
+            report.unresolved = set(transport.resolve_addresses(sorted(unique)))
+        for distributor_id, addresses in recipients.items():
+            unresolved = [a for a in addresses if a in report.unresolved]
+            if unresolved:
+                report.problems[distributor_id] = f"Unresolved recipients: {', '.join(unresolved)}"
+    stats.count("recipients_checked", report.addresses)
+    stats.count("recipients_rejected", len(report.problems))
+    return report
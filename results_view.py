@@ -0,0 +1,344 @@
+import tkinter as tk
+from bisect import bisect_left, bisect_right
+from tkinter import ttk
+
+COLUMNS = ["name", "email", "status", "file", "commission", "month", "ratio"]
+WIDTHS = [180, 200, 120, 150, 100, 100, 60]
+STATUS_FILTERS = ["All", "Matched", "No match"]
+
+
+class _Descending:
+    """Sort key wrapper that inverts ordering, so a descending view can use bisect too"""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+class ResultsView(ttk.Frame):
+    """Virtualized match results table.
+
+    All rows live in a plain Python model; the Treeview only ever holds the rows that fit on
+    screen, so adding, sorting and filtering tens of thousands of results never grows the
+    widget. Item ids of the visible rows are the row ids (distributor ids), so tree.focus()
+    and selection work as with a normal Treeview. Re-rendering is coalesced through after().
+
+    Filter and sort changes rebuild the view; row updates only patch it (sorted views with
+    bisect), so streaming results into a large sorted table costs per changed row, not per
+    row in the table.
+    """
+
+    def __init__(self, container, height=12, render_delay_ms=40, **kwargs):
+        super().__init__(container, **kwargs)
+        self.rows = {}          # row id -> (values, tags)
+        self.order = []         # row ids in insertion (match) order
+        self.view = []          # row ids after filter and sort
+        self.view_keys = []     # sort keys aligned with view, when sorted
+        self.key_of = {}        # row id -> its sort key in view_keys
+        self.in_view = set()    # row ids in view, when filtered but unsorted
+        self.view_unordered = False  # rows were appended to a filtered view out of match order
+        self.offset = 0
+        self.page = height
+        self.sort_column = None
+        self.sort_reverse = False
+        self.selected = None
+        self.render_delay_ms = render_delay_ms
+        self._view_dirty = True
+        self._changed = set()   # rows updated since the last render, for a partial patch
+        self._render_pending = False
+
+        self._create_filter_bar()
+
+        self.tree = ttk.Treeview(self, columns=COLUMNS, show="headings", height=height, selectmode="browse")
+        for col, width in zip(COLUMNS, WIDTHS):
+            self.tree.heading(col, text=col.capitalize(), command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=width)
+        self.tree.tag_configure('matched', background='#e6ffe6')
+        self.tree.tag_configure('unmatched', background='#ffe6e6')
+
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        hsb = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=hsb.set)
+
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add="+")
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self._step(-1))
+        self.tree.bind('<Down>', lambda e: self._step(1))
+        self.tree.bind('<Prior>', lambda e: self._step(-self.page))
+        self.tree.bind('<Next>', lambda e: self._step(self.page))
+        self.tree.bind('<Configure>', self._on_resize)
+
+    def _create_filter_bar(self):
+        bar = ttk.Frame(self)
+        bar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 3))
+
+        self.status_filter = tk.StringVar(value=STATUS_FILTERS[0])
+        self.min_ratio_filter = tk.StringVar()
+        self.month_filter = tk.StringVar()
+        self.file_filter = tk.StringVar()
+
+        ttk.Label(bar, text="Show:").pack(side=tk.LEFT)
+        ttk.Combobox(bar, textvariable=self.status_filter, values=STATUS_FILTERS, width=10,
+                     state="readonly").pack(side=tk.LEFT, padx=(2, 8))
+        for label, var, width in (("Min ratio:", self.min_ratio_filter, 6),
+                                  ("Month:", self.month_filter, 10),
+                                  ("File:", self.file_filter, 16)):
+            ttk.Label(bar, text=label).pack(side=tk.LEFT)
+            ttk.Entry(bar, textvariable=var, width=width).pack(side=tk.LEFT, padx=(2, 8))
+        self.count_label = ttk.Label(bar, text="")
+        self.count_label.pack(side=tk.RIGHT)
+
+        for var in (self.status_filter, self.min_ratio_filter, self.month_filter, self.file_filter):
+            var.trace_add("write", lambda *args: self._invalidate())
+
+    # Model updates
+
+    def clear(self):
+        self.rows.clear()
+        self.order = []
+        self.offset = 0
+        self.selected = None
+        self._invalidate()
+
+    def upsert(self, row_id, position, values, tags):
+        """Insert or update a row and move it to position in match order"""
+        if row_id in self.rows:
+            if position >= len(self.order) or self.order[position] != row_id:
+                self.order.remove(row_id)
+                self.order.insert(position, row_id)
+        elif position >= len(self.order):
+            self.order.append(row_id)
+        else:
+            self.order.insert(position, row_id)
+        self.rows[row_id] = (tuple(values), tuple(tags))
+        self._touch(row_id)
+
+    def remove(self, row_id):
+        if self.rows.pop(row_id, None) is not None:
+            self.order.remove(row_id)
+            if self.selected == row_id:
+                self.selected = None
+            self._touch(row_id)
+
+    def refresh(self):
+        """Put rows appended to a filtered, unsorted view back in match order (call when a
+        run finishes); sorted and unfiltered views are always exact and are left alone"""
+        if self.view_unordered:
+            self._invalidate()
+
+    def ids(self):
+        """All row ids in match order, regardless of the current filter"""
+        return list(self.order)
+
+    def values(self, row_id):
+        return self.rows[row_id][0]
+
+    # Filtering and sorting
+
+    def _row_filter(self):
+        """Predicate for the current filter bar, or None when nothing is filtered.
+
+        The Tk variables are read once here rather than once per row.
+        """
+        status = self.status_filter.get()
+        month = self.month_filter.get().strip().lower()
+        file_text = self.file_filter.get().strip().lower()
+        try:
+            min_ratio = float(self.min_ratio_filter.get())
+        except ValueError:
+            min_ratio = None
+        want_tag = {"Matched": 'matched', "No match": 'unmatched'}.get(status)
+        if not (want_tag or month or file_text or min_ratio is not None):
+            return None
+
+        def keep(values, tags):
+            if want_tag and want_tag not in tags:
+                return False
+            if month and month not in str(values[5]).lower():
+                return False
+            if file_text and file_text not in str(values[3]).lower():
+                return False
+            if min_ratio is not None and (values[6] == "" or values[6] < min_ratio):
+                return False
+            return True
+        return keep
+
+    def _sort_key(self, row_id):
+        value = self.rows[row_id][0][COLUMNS.index(self.sort_column)]
+        if isinstance(value, (int, float)):
+            key = (0, value, "")
+        else:
+            try:
+                key = (0, float(value), "")
+            except (TypeError, ValueError):
+                key = (1, 0, str(value).lower())
+        return _Descending(key) if self.sort_reverse else key
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        for col in COLUMNS:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if col == self.sort_column else ""
+            self.tree.heading(col, text=col.capitalize() + arrow)
+        self._invalidate()
+
+    def _rebuild_view(self):
+        keep = self._row_filter()
+        if keep:
+            view = [row_id for row_id in self.order if keep(*self.rows[row_id])]
+        else:
+            view = self.order
+        self.key_of = {}
+        self.view_keys = []
+        self.in_view = set()
+        if self.sort_column:
+            # Stable, so equal keys stay in match order (either direction)
+            self.key_of = {row_id: self._sort_key(row_id) for row_id in view}
+            view = sorted(view, key=self.key_of.__getitem__)
+            self.view_keys = [self.key_of[row_id] for row_id in view]
+        elif keep:
+            self.in_view = set(view)
+        self.view = view
+        self.view_unordered = False
+        self._view_dirty = False
+        self._changed.clear()
+        self.count_label.config(text=f"{len(view)} of {len(self.order)} rows")
+
+    def _patch_view(self):
+        """Apply the rows changed since the last render to the current view"""
+        changed, self._changed = self._changed, set()
+        keep = self._row_filter()
+        if self.sort_column:
+            for row_id in changed:
+                old = self.key_of.pop(row_id, None)
+                if old is not None:
+                    i = bisect_left(self.view_keys, old)
+                    while self.view[i] != row_id:
+                        i += 1
+                    del self.view[i]
+                    del self.view_keys[i]
+                if row_id in self.rows and (keep is None or keep(*self.rows[row_id])):
+                    key = self.key_of[row_id] = self._sort_key(row_id)
+                    i = bisect_right(self.view_keys, key)
+                    self.view.insert(i, row_id)
+                    self.view_keys.insert(i, key)
+        elif keep is not None:
+            # New rows go to the end; refresh() puts them back in match order
+            for row_id in changed:
+                wanted = row_id in self.rows and keep(*self.rows[row_id])
+                if wanted and row_id not in self.in_view:
+                    self.view.append(row_id)
+                    self.in_view.add(row_id)
+                    self.view_unordered = True
+                elif not wanted and row_id in self.in_view:
+                    self.view.remove(row_id)
+                    self.in_view.discard(row_id)
+        # Unsorted and unfiltered, view is self.order itself
+        self.count_label.config(text=f"{len(self.view)} of {len(self.order)} rows")
+
+    # Rendering
+
+    def _invalidate(self):
+        self._view_dirty = True
+        self._schedule_render()
+
+    def _touch(self, row_id):
+        if not self._view_dirty:
+            self._changed.add(row_id)
+        self._schedule_render()
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after(self.render_delay_ms, self._render)
+
+    def _render(self):
+        self._render_pending = False
+        if self._view_dirty:
+            self._rebuild_view()
+        elif self._changed:
+            self._patch_view()
+        total = len(self.view)
+        self.offset = max(0, min(self.offset, total - self.page))
+
+        window = self.view[self.offset:self.offset + self.page]
+        current = self.tree.get_children()
+        if list(current) != window:
+            self.tree.delete(*current)
+            for row_id in window:
+                values, tags = self.rows[row_id]
+                self.tree.insert("", tk.END, iid=row_id, values=values, tags=tags)
+        else:
+            for row_id in window:
+                values, tags = self.rows[row_id]
+                self.tree.item(row_id, values=values, tags=tags)
+
+        if self.selected in window:
+            if self.tree.selection() != (self.selected,):
+                self.tree.selection_set(self.selected)
+            self.tree.focus(self.selected)
+
+        if total:
+            self.vsb.set(self.offset / total, min(1.0, (self.offset + self.page) / total))
+        else:
+            self.vsb.set(0, 1)
+
+    def scroll(self, rows):
+        self.offset = max(0, min(self.offset + rows, len(self.view) - self.page))
+        self._render()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.view))
+            self.scroll(0)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.scroll(amount * self.page if args[2] == "pages" else amount)
+
+    def _on_select(self, event):
+        focus = self.tree.focus()
+        if focus:
+            self.selected = focus
+
+    def _step(self, delta):
+        """Keyboard navigation across the whole result set, scrolling the window as needed"""
+        if not self.view:
+            return "break"
+        if self.selected in self.rows and not self._view_dirty:
+            try:
+                index = self.view.index(self.selected)
+            except ValueError:
+                index = self.offset
+        else:
+            index = self.offset
+        index = max(0, min(index + delta, len(self.view) - 1))
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.page:
+            self.offset = index - self.page + 1
+        self.selected = self.view[index]
+        self._render()
+        self.tree.event_generate('<<TreeviewSelect>>')
+        return "break"
+
+    def _on_resize(self, event):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        page = max(1, (event.height - rowheight) // rowheight)
+        if page != self.page:
+            self.page = page
+            self._render()
@@ -0,0 +1,421 @@
+import os
+import csv
+import codecs
+import itertools
+from bisect import bisect_right
+from difflib import SequenceMatcher
+from functools import partial
+
+from parse_cache import MISS
+
+REVENUE_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+NAME_KEYS = ["Distributors", "Distributor' Name", "Distributor Name", "Distributor"]
+MATCH_THRESHOLD = 0.8
+PREVIEW_ROWS = 3
+HEADER_SCAN_ROWS = 10  # rows searched for the header row (banner rows may sit above it)
+
+
+def detect_encoding(path):
+    """Encoding for a text file: a BOM wins, then UTF-8 if the whole file decodes, else cp1252.
+
+    The check streams the file through an incremental decoder, so nothing is held in memory.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(4)
+        if head.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            decoder.decode(head)
+            for block in iter(lambda: f.read(1 << 20), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            # Excel on Windows saves "CSV" in the ANSI code page
+            return 'cp1252'
+    return 'utf-8'
+
+
+def iter_sheet(path, data_only=False):
+    """Stream the first sheet of a revenue file: yields the header row, then each data row.
+
+    Nothing is yielded for unsupported extensions. Workbooks are opened in streaming mode and
+    released as soon as the generator finishes or is closed. With data_only, .xlsx formulas
+    come back as their cached values; CSV encodings are detected with detect_encoding().
+    """
+    ext = os.path.splitext(path)[-1].lower()
+
+    # Spreadsheet libraries are imported on first use so CSV-only and headless runs start fast
+    if ext == ".xlsx":
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=data_only)
+        try:
+            sheet = wb.active
+            # Don't trust (or, when missing, pre-scan the whole sheet for) the stored
+            # dimensions; rows are then not padded to a common width
+            sheet.reset_dimensions()
+            yield from sheet.iter_rows(values_only=True)
+        finally:
+            wb.close()
+    elif ext == ".xls":
+        import xlrd
+        wb = xlrd.open_workbook(path, on_demand=True)
+        try:
+            sheet = wb.sheet_by_index(0)
+            for i in range(sheet.nrows):
+                yield sheet.row_values(i)
+        finally:
+            wb.release_resources()
+    elif ext == ".csv":
+        encoding = detect_encoding(path)
+        errors = 'replace' if encoding == 'cp1252' else 'strict'
+        with open(path, 'r', encoding=encoding, errors=errors, newline='', buffering=1 << 20) as f:
+            yield from csv.reader(f)
+
+
+def iter_sheets(path, data_only=False, start_rows=None):
+    """Stream every sheet of a revenue file from one open workbook: yields (sheet name, rows).
+
+    Each sheet's rows must be consumed (or abandoned) before the next sheet is requested.
+    With start_rows ({sheet name: first row index}) only those sheets are read, each from
+    that row on, so sheets without data are never parsed. A CSV file is one sheet named "".
+    """
+    ext = os.path.splitext(path)[-1].lower()
+
+    if ext == ".xlsx":
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=data_only)
+        try:
+            for sheet in wb.worksheets:
+                if start_rows is not None and sheet.title not in start_rows:
+                    continue
+                sheet.reset_dimensions()
+                start = start_rows[sheet.title] if start_rows else 0
+                yield sheet.title, sheet.iter_rows(min_row=start + 1, values_only=True)
+        finally:
+            wb.close()
+    elif ext == ".xls":
+        import xlrd
+        wb = xlrd.open_workbook(path, on_demand=True)
+        try:
+            for name in wb.sheet_names():
+                if start_rows is not None and name not in start_rows:
+                    continue
+                sheet = wb.sheet_by_name(name)
+                start = start_rows[name] if start_rows else 0
+                yield name, (sheet.row_values(i) for i in range(start, sheet.nrows))
+                wb.unload_sheet(name)
+        finally:
+            wb.release_resources()
+    elif ext == ".csv":
+        if start_rows is not None and "" not in start_rows:
+            return
+        encoding = detect_encoding(path)
+        errors = 'replace' if encoding == 'cp1252' else 'strict'
+        with open(path, 'r', encoding=encoding, errors=errors, newline='', buffering=1 << 20) as f:
+            yield "", itertools.islice(csv.reader(f), start_rows[""] if start_rows else 0, None)
+
+
+def _header_key(value):
+    return '' if value is None else str(value).strip().lower()
+
+
+_NAME_KEYS = [key.lower() for key in NAME_KEYS]
+
+
+def name_column(headers):
+    """Index of the distributor name column (first of NAME_KEYS present), or None.
+
+    Headers are compared trimmed and case-insensitively.
+    """
+    keys = [_header_key(h) for h in headers]
+    return next((keys.index(k) for k in _NAME_KEYS if k in keys), None)
+
+
+def scan_sheets(path, layout=None):
+    """Yield (sheet name, header row, headers, name column, data rows) for every sheet of a
+    revenue file that has a distributor name column.
+
+    Without a layout the header row is looked for in the first HEADER_SCAN_ROWS rows of each
+    sheet, and a sheet without one is left after those rows. A layout (RevenueFile.layout
+    from an earlier parse of the same file version) goes straight to its sheets and rows.
+    """
+    stream = iter_sheets(path, start_rows=dict(layout) if layout is not None else None)
+    try:
+        for sheet, rows in stream:
+            if layout is not None:
+                header_row = dict(layout)[sheet]
+                headers = next(rows, None)
+                name_col = name_column(headers) if headers is not None else None
+            else:
+                name_col = None
+                for header_row, headers in enumerate(itertools.islice(rows, HEADER_SCAN_ROWS)):
+                    name_col = name_column(headers)
+                    if name_col is not None:
+                        break
+            if name_col is not None:
+                yield sheet, header_row, list(headers), name_col, rows
+    finally:
+        stream.close()
+
+
+def _last_index(keys, key):
+    # dict(zip(headers, row)) keeps the last duplicate header, so lookups must too
+    for i in range(len(keys) - 1, -1, -1):
+        if keys[i] == key:
+            return i
+    return None
+
+
+class FieldExtractor:
+    """Pulls commission and month out of a row the same way the matcher always has,
+    with the header positions resolved once per sheet instead of a dict per row"""
+
+    def __init__(self, headers):
+        keys = [_header_key(h) for h in headers]
+        self.commission_cols = [_last_index(keys, 'package number'), _last_index(keys, 'commission')]
+        self.month_cols = [_last_index(keys, 'ecare month'), _last_index(keys, 'month')]
+
+    @staticmethod
+    def _first(row, cols):
+        value = ''
+        for col in cols:
+            value = row[col] if col is not None and col < len(row) else ''
+            if value:
+                return value
+        return value
+
+    def __call__(self, row):
+        return self._first(row, self.commission_cols), self._first(row, self.month_cols)
+
+
+class SheetInfo:
+    """Where one sheet's rows sit in a RevenueFile, with its headers and preview rows"""
+
+    __slots__ = ('name', 'header_row', 'headers', 'preview', 'start', 'row_count')
+
+    def __init__(self, name, header_row, headers, start):
+        self.name = name
+        self.header_row = header_row
+        self.headers = headers
+        self.preview = []
+        self.start = start
+        self.row_count = 0
+
+
+class RevenueFile:
+    """The columns of one revenue file that matching needs, extracted in a single streaming pass.
+
+    Rows of every sheet with a distributor name column are kept in sheet order. Only the
+    name, commission and month of each row are kept (repeated values share one object) plus
+    the first PREVIEW_ROWS rows of each sheet, so memory grows with the number of rows but
+    not with the width or size of the workbook.
+    """
+
+    def __init__(self, path, sheets):
+        """sheets yields (sheet name, header row, headers, name column, rows), as scan_sheets does"""
+        self.path = path
+        self.names = []
+        self.commissions = []
+        self.months = []
+        self.sheets = []
+        shared = {}
+        for sheet_name, header_row, headers, name_col, rows in sheets:
+            info = SheetInfo(sheet_name, header_row, headers, len(self.names))
+            extract = FieldExtractor(headers)
+            for row in rows:
+                if info.row_count < PREVIEW_ROWS:
+                    info.preview.append(tuple(row))
+                info.row_count += 1
+                value = row[name_col] if name_col < len(row) else None
+                name = '' if value is None else str(value).strip()
+                commission, month = extract(row)
+                self.names.append(shared.setdefault(name, name))
+                self.commissions.append(shared.setdefault(commission, commission) if isinstance(commission, str) else commission)
+                self.months.append(shared.setdefault(month, month) if isinstance(month, str) else month)
+            self.sheets.append(info)
+        self.row_count = len(self.names)
+        self.lower_names = self._lower(self.names)
+
+    @property
+    def layout(self):
+        """((sheet name, header row), ...) of the sheets holding distributor names"""
+        return tuple((info.name, info.header_row) for info in self.sheets)
+
+    def sheet_at(self, row_idx):
+        starts = [info.start for info in self.sheets]
+        return self.sheets[bisect_right(starts, row_idx) - 1]
+
+    @staticmethod
+    def _lower(names):
+        lowered = {}
+        return [lowered[name] if name in lowered else lowered.setdefault(name, name.lower()) for name in names]
+
+    def __getstate__(self):
+        # lower_names is derived; keep cache entries small
+        state = self.__dict__.copy()
+        del state['lower_names']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lower_names = self._lower(self.names)
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+    def match_info(self, row_idx, ratio):
+        sheet = self.sheet_at(row_idx)
+        return {
+            'filepath': self.path,
+            'match_ratio': ratio,
+            'row': row_idx,
+            'name': self.names[row_idx],
+            'commission': self.commissions[row_idx],
+            'month': self.months[row_idx],
+            'sheet': sheet.name,
+            'headers': sheet.headers,
+            'rows': sheet.preview,
+            'row_count': sheet.row_count,
+        }
+
+    def best_match(self, target_name):
+        """Best-scoring row for target_name; ties keep the earliest row"""
+        target = target_name.lower()
+        best_idx = None
+        best_ratio = 0
+        for i, name in enumerate(self.lower_names):
+            ratio = SequenceMatcher(None, name, target).ratio()
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_idx = i
+        if best_idx is None:
+            return None
+        return self.match_info(best_idx, best_ratio)
+
+
+def parse_revenue_file(path, layouts=None):
+    """Parse a revenue file; returns None if no sheet has a distributor name column.
+
+    layouts (a ParseCache of RevenueFile.layout) remembers which sheets and header rows a
+    version of the file has: a re-parse then reads only those sheets, and a file known to
+    have none is not opened at all.
+    """
+    layout = layouts.get(path) if layouts is not None else MISS
+    if layout is not MISS and not layout:
+        return None
+    sheets = scan_sheets(path, None if layout is MISS else layout)
+    try:
+        revenue_file = RevenueFile(path, sheets)
+    finally:
+        sheets.close()
+    if layouts is not None and layout is MISS:
+        layouts.put(path, revenue_file.layout)
+    return revenue_file if revenue_file.sheets else None
+
+
+def load_revenue_file(path, cache=None, layouts=None):
+    """Like parse_revenue_file, but served from cache when the file is unchanged"""
+    if cache is None:
+        return parse_revenue_file(path, layouts)
+    revenue_file = cache.get(path)
+    if revenue_file is MISS:
+        revenue_file = parse_revenue_file(path, layouts)
+        cache.put(path, revenue_file)
+    elif revenue_file is not None:
+        revenue_file.path = path
+    return revenue_file
+
+
+class RevenueTable:
+    """All usable revenue files of a folder, parsed once and queried per distributor"""
+
+    def __init__(self, files):
+        self.files = files
+        self.comparisons = 0
+
+    def __len__(self):
+        return len(self.files)
+
+    @property
+    def row_count(self):
+        return sum(f.row_count for f in self.files)
+
+    def find_matches(self, target_name, threshold=MATCH_THRESHOLD):
+        """Per-file best matches above threshold, highest ratio first"""
+        matches = []
+        for revenue_file in self.files:
+            self.comparisons += revenue_file.row_count
+            match_info = revenue_file.best_match(target_name)
+            if match_info and match_info['match_ratio'] > threshold:
+                matches.append(match_info)
+        matches.sort(key=lambda x: x['match_ratio'], reverse=True)
+        return matches
+
+    def find_matches_batch(self, target_names, threshold=MATCH_THRESHOLD):
+        return [self.find_matches(name, threshold) for name in target_names]
+
+
+def list_revenue_files(folder):
+    return [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(REVENUE_EXTENSIONS)]
+
+
+def _parse_or_error(path, layouts=None):
+    try:
+        return parse_revenue_file(path, layouts)
+    except Exception as e:
+        return e
+
+
+def _parse_all(paths, workers, layouts=None):
+    """Parse paths serially or across a process pool; failures come back as exceptions, in order"""
+    if workers > 1 and len(paths) > 1:
+        # Imported here so the app starts without loading multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+                return list(pool.map(partial(_parse_or_error, layouts=layouts), paths))
+        except (OSError, BrokenProcessPool):
+            pass  # workers could not be started or died; parse in this process instead
+    return [_parse_or_error(path, layouts) for path in paths]
+
+
+def load_revenue_files(paths, on_error=None, cache=None, workers=1, layouts=None):
+    """Load paths (from cache where unchanged); returns a list aligned with paths.
+
+    Entries are None for files without a distributor name column and for files that failed
+    to parse; on_error(path, exc) is called for the latter, in path order.
+    With workers > 1 uncached files are parsed in a process pool; the result and the errors
+    reported are the same as for a serial run. layouts is passed on to parse_revenue_file.
+    """
+    loaded = [cache.get(path) if cache is not None else MISS for path in paths]
+
+    todo = [i for i, value in enumerate(loaded) if value is MISS]
+    for i, result in zip(todo, _parse_all([paths[i] for i in todo], workers, layouts)):
+        loaded[i] = result
+        if cache is not None and not isinstance(result, Exception):
+            cache.put(paths[i], result)
+    if layouts is not None and workers > 1 and len(todo) > 1:
+        layouts.evict()  # the pool's copies of layouts only kept their own totals
+
+    for i, (path, revenue_file) in enumerate(zip(paths, loaded)):
+        if isinstance(revenue_file, Exception):
+            if on_error:
+                on_error(path, revenue_file)
+            loaded[i] = None
+        elif revenue_file is not None:
+            revenue_file.path = path
+    return loaded
+
+
+def load_revenue_folder(folder, on_error=None, cache=None, workers=1, layouts=None):
+    """Read every revenue file in folder exactly once (or not at all, if cached).
+
+    on_error(path, exc) is called for files that fail to parse; they are left out of the table.
+    """
+    loaded = load_revenue_files(list_revenue_files(folder), on_error, cache, workers, layouts)
+    return RevenueTable([revenue_file for revenue_file in loaded if revenue_file is not None])
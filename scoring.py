@@ -0,0 +1,175 @@
+"""Batch similarity scoring: many distributor names against every distinct revenue name at once.
+
+A vectorized backend picks candidate names for a whole block of distributors in one call, and
+the candidates are then re-ranked with SequenceMatcher, so reported ratios are always the
+ones the matcher has always used:
+
+- "rapidfuzz": C-backed, multi-threaded Indel similarity (rapidfuzz.process.cdist). Indel
+  similarity is 2*LCS/(len1+len2), and SequenceMatcher's matching blocks form a common
+  subsequence, so it never scores below ratio(); filtering on it loses nothing and the
+  results equal NameIndex.find_matches exactly.
+- "trigram": character-trigram vectors and sparse cosine similarity (NumPy/SciPy), keeping
+  the top_k most similar names per distributor. Fast at any size but approximate: a pair
+  that shares few trigrams yet passes the threshold can be missed.
+- "python": no optional dependency; NameIndex's bounded scan, one name at a time.
+
+"auto" picks rapidfuzz when installed and otherwise falls back to python, so the default
+never changes results.
+"""
+from difflib import SequenceMatcher
+from importlib.util import find_spec
+
+from matching import NameIndex, normalize_name
+from revenue import MATCH_THRESHOLD
+
+BACKENDS = ("auto", "rapidfuzz", "trigram", "python")
+
+
+def available_backends():
+    """Installed backends, fastest first (checked without importing them)"""
+    found = ["python"]
+    if find_spec("numpy") and find_spec("scipy"):
+        found.insert(0, "trigram")
+    if find_spec("rapidfuzz") and find_spec("numpy"):
+        found.insert(0, "rapidfuzz")
+    return found
+
+
+def resolve_backend(backend="auto"):
+    """The backend that will actually run for a requested one (missing libraries fall back)"""
+    found = available_backends()
+    if backend == "auto":
+        return "rapidfuzz" if "rapidfuzz" in found else "python"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown scoring backend: {backend}")
+    return backend if backend in found else "python"
+
+
+def _trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class BatchScorer:
+    """Scores blocks of distributor names against a NameIndex.
+
+    find_matches_batch(names) returns, for each name, the same per-file best matches list as
+    NameIndex.find_matches (exactly so for the rapidfuzz and python backends).
+    """
+
+    def __init__(self, index, backend="auto", top_k=50, block_size=64):
+        self.index = index
+        self.table = index.table
+        self.backend = resolve_backend(backend)
+        self.top_k = top_k
+        self.block_size = block_size
+        self.comparisons = 0
+        self._vectors = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def find_matches(self, target_name, threshold=MATCH_THRESHOLD):
+        return self.find_matches_batch([target_name], threshold)[0]
+
+    def find_matches_batch(self, target_names, threshold=MATCH_THRESHOLD):
+        if self.backend == "python" or not len(self.index):
+            matches = self.index.find_matches_batch(target_names, threshold)
+            self.comparisons = self.index.comparisons
+            return matches
+
+        targets = [name.lower() for name in target_names]
+        results = []
+        for start in range(0, len(targets), self.block_size):
+            block = targets[start:start + self.block_size]
+            if self.backend == "rapidfuzz":
+                candidates = self._rapidfuzz_candidates(block, threshold)
+            else:
+                candidates = self._trigram_candidates(block)
+            for target, name_ids in zip(block, candidates):
+                results.append(self.index.file_matches(self._rerank(target, name_ids, threshold)))
+        return results
+
+    def _rerank(self, target, name_ids, threshold):
+        """Exact SequenceMatcher ratios for the candidates, plus the exact/normalized hits"""
+        ids = set(name_ids)
+        exact_id = self.index.exact.get(target)
+        if exact_id is not None:
+            ids.add(exact_id)
+        ids.update(self.index.normalized.get(normalize_name(target), ()))
+
+        matcher = SequenceMatcher(None, "", target)
+        scored = []
+        for name_id in ids:
+            matcher.set_seq1(self.index.names[name_id])
+            ratio = matcher.ratio()
+            if ratio > threshold:
+                scored.append((name_id, ratio))
+        self.comparisons += len(ids)
+        return scored
+
+    def _rapidfuzz_candidates(self, block, threshold):
+        import numpy as np
+        from rapidfuzz import fuzz, process
+
+        # Indel similarity >= SequenceMatcher ratio, so this cutoff only drops names that
+        # cannot pass; the small margin absorbs float rounding in the percentage scale
+        cutoff = threshold * 100 - 1e-6
+        scores = process.cdist(block, self.index.names, scorer=fuzz.ratio, score_cutoff=cutoff,
+                               dtype=np.float32, workers=-1)
+        return [np.flatnonzero(row >= cutoff) for row in scores]
+
+    def _build_vectors(self):
+        import numpy as np
+        from scipy import sparse
+
+        vocab = {}
+        indptr = [0]
+        indices = []
+        for name in self.index.names:
+            for gram in _trigrams(name):
+                indices.append(vocab.setdefault(gram, len(vocab)))
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(self.index.names), len(vocab)))
+        norms = np.sqrt(np.diff(matrix.indptr)).astype(np.float32)
+        norms[norms == 0] = 1
+        matrix = sparse.diags(1 / norms) @ matrix
+        self._vectors = (vocab, matrix.T.tocsr())
+
+    def _trigram_candidates(self, block):
+        import numpy as np
+        from scipy import sparse
+
+        if self._vectors is None:
+            self._build_vectors()
+        vocab, names_t = self._vectors
+
+        indptr = [0]
+        indices = []
+        for target in block:
+            indices.extend({vocab[gram] for gram in _trigrams(target) if gram in vocab})
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        queries = sparse.csr_matrix((data, indices, indptr), shape=(len(block), len(vocab)))
+        similarity = (queries @ names_t).tocsr()
+
+        candidates = []
+        for i in range(len(block)):
+            row_ids = similarity.indices[similarity.indptr[i]:similarity.indptr[i + 1]]
+            row_scores = similarity.data[similarity.indptr[i]:similarity.indptr[i + 1]]
+            if len(row_ids) > self.top_k:
+                keep = np.argpartition(-row_scores, self.top_k)[:self.top_k]
+                row_ids = row_ids[keep]
+            candidates.append(row_ids.tolist())
+        return candidates
+
+
+def build_matcher(table, engine="indexed", backend="auto"):
+    """Matcher for a RevenueTable: "scan" (brute force), "indexed" (NameIndex) or "batch" (BatchScorer)"""
+    if engine == "scan":
+        return table
+    index = NameIndex(table)
+    if engine == "batch":
+        return BatchScorer(index, backend)
+    return index
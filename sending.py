@@ -0,0 +1,326 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from attachments import AttachmentSet
+from extracts import build_extracts
+from journal import FAILED, SENT, SendJournal, journal_key
+from matching import normalize_name
+from recipients import bare_address, check_recipients, clean_email_list, is_valid_email, split_addresses
+from stats import NULL_STATS
+from templates import MessageRenderer
+from transport import TransportError
+
+
+class PrepareError(Exception):
+    """A message could not be built; args[0] is the short reason, args[1] the detail"""
+
+
+class OutgoingMessage:
+    __slots__ = ('distributor_id', 'distributor_name', 'to', 'cc', 'subject', 'body', 'attachments', 'html')
+
+    def __init__(self, distributor, to, cc, subject, body, attachments, html=False):
+        self.distributor_id = distributor.id
+        self.distributor_name = distributor.name
+        self.to = to
+        self.cc = cc
+        self.subject = subject
+        self.body = body
+        self.attachments = attachments
+        self.html = html
+
+
+def prepare_message(distributor, file_paths, attachments=None, rendered=None):
+    """Resolve attachments, render the body and validate recipients for one distributor.
+
+    attachments is the batch's AttachmentSet, so files shared by many distributors are only
+    stat'ed and hashed once. rendered is the distributor's RenderedMessage when the caller
+    has already rendered it (with its matches); otherwise the bare templates are rendered.
+    """
+    if not distributor:
+        raise PrepareError("No data", "No distributor data found")
+
+    if not is_valid_email(distributor.email):
+        raise PrepareError("Bad email", f"Invalid email: {distributor.email}")
+
+    if attachments is None:
+        attachments = AttachmentSet()
+    resolved = attachments.resolve(file_paths)
+    if not resolved:
+        raise PrepareError("No valid attachments found", "No valid attachments found")
+
+    if rendered is None:
+        rendered = MessageRenderer().render(distributor)
+    # Entries are re-joined with ';', which Outlook and split_addresses both accept
+    to = clean_email_list(distributor.email)
+    cc = clean_email_list(distributor.cc) if distributor.cc else ""
+    return OutgoingMessage(distributor, to, cc,
+                           rendered.subject, rendered.body, resolved, rendered.html)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, sleep=time.sleep):
+        """Take one token, sleeping (through `sleep`, so callers can interrupt) until one is free"""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+class SendPipeline:
+    """Prepares messages on a small thread pool and submits them through a transport.
+
+    Preparation runs up to `prepare_workers` items ahead of submission. Submission happens on
+    the calling thread, in input order, at most as fast as the token bucket allows. With an
+    extract_dir, an extract stage first splits every matched revenue file by distributor
+    (across `extract_workers` processes) and each distributor gets only their rows.
+
+    With a journal_path every outcome is recorded in a SendJournal, and items already sent
+    in an earlier run (same distributor, month and revenue files) are skipped. Sends that
+    fail for a transient reason are retried up to `retry_attempts` times with exponential
+    backoff from a separate queue, between the remaining items of the batch.
+
+    Subjects and bodies for the whole batch are rendered in one pass through `renderer` (a
+    MessageRenderer, shared with the preview pane so rows already previewed are not rendered
+    again) before any message is built.
+
+    Before anything is extracted or built, every TO/CC address of the batch is validated once
+    and resolved through the transport where it supports that; distributors whose addresses
+    would fail are reported together up front and never reach the send stage.
+
+    Stage times and counts go to `stats` (a RunStats), which is also handed to the transport.
+    """
+
+    def __init__(self, transport, bucket, prepare_workers=4, extract_dir=None, extract_workers=1,
+                 journal_path=None, retry_attempts=3, retry_base_seconds=30, stats=NULL_STATS,
+                 renderer=None, check_dns=False, layouts=None):
+        self.transport = transport
+        self.bucket = bucket
+        self.prepare_workers = max(1, prepare_workers)
+        self.extract_dir = extract_dir
+        self.extract_workers = max(1, extract_workers)
+        self.journal_path = journal_path
+        self.retry_attempts = retry_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.stats = stats
+        self.renderer = renderer or MessageRenderer()
+        self.check_dns = check_dns
+        self.layouts = layouts
+
+    @staticmethod
+    def _month(matches):
+        return ";".join(sorted({str(m.get('month', '')) for m in matches}))
+
+    @staticmethod
+    def _recipient(distributor):
+        """Who a mailing goes to, independent of the row's subject, body and CC (which are part
+        of Distributor.id, so fixing a typo there must not make a resumed batch re-send)"""
+        addresses = sorted({bare_address(entry).lower() for entry in split_addresses(distributor.email)})
+        return normalize_name(distributor.name) + "\x1f" + ";".join(addresses)
+
+    def _journal_key(self, distributor, matches, attachments):
+        digests = [attachment.digest for attachment in (attachments.get(m['filepath']) for m in matches)
+                   if attachment is not None]
+        return journal_key(self._recipient(distributor), self._month(matches), digests)
+
+    def _prepare(self, distributor, file_paths, attachments, rendered):
+        with self.stats.timer("build_message"):
+            return prepare_message(distributor, file_paths, attachments, rendered)
+
+    def run(self, work_items, job=None):
+        """Yield (distributor, error or None, detail) for each (distributor, matches)"""
+        checkpoint = job.checkpoint if job else (lambda: None)
+        sleep = job.sleep if job else time.sleep
+        total = len(work_items)
+
+        attachments = AttachmentSet()
+        journal = SendJournal(self.journal_path) if self.journal_path else None
+        try:
+            # Every source file is checked (and hashed, for the journal) once up front
+            if job:
+                job.progress(0, total, "Checking attachments...")
+            with self.stats.timer("attachments_check"):
+                missing = attachments.validate(m['filepath'] for _, matches in work_items for m in matches)
+
+            todo = []
+            for distributor, matches in work_items:
+                key = self._journal_key(distributor, matches, attachments)
+                if journal and journal.completed(key):
+                    self.stats.count("skipped_already_sent")
+                    yield distributor, None, "Skipped: already sent in an earlier run"
+                else:
+                    todo.append((distributor, matches, key))
+
+            # Items with a missing file fail together now, instead of going out short a file
+            if missing:
+                problems = self._missing_files(todo, [[m['filepath'] for m in matches]
+                                                      for _, matches, _ in todo], missing)
+                todo = yield from self._reject(todo, problems, "Missing attachment", journal)
+
+            self.transport.stats = self.stats
+            with self.transport:
+                # Pre-flight: every distinct TO/CC address is checked (and resolved, where the
+                # transport can) once, and the rejects are reported together before any work
+                if job:
+                    job.progress(total - len(todo), total, "Checking recipients...")
+                with self.stats.timer("recipient_check"):
+                    report = check_recipients([d for d, _, _ in todo], self.transport,
+                                              self.check_dns, self.stats)
+                if report.problems:
+                    todo = yield from self._reject(todo, report.problems, "Bad email", journal)
+
+                if self.extract_dir:
+                    if job:
+                        job.progress(0, total, "Writing distributor extracts...")
+                    with self.stats.timer("extracts"):
+                        extracted = build_extracts([(d, m) for d, m, _ in todo], self.extract_dir,
+                                                   self.extract_workers, checkpoint=checkpoint,
+                                                   layouts=self.layouts)
+                    file_paths = [extracted[distributor.id] for distributor, _, _ in todo]
+                    with self.stats.timer("attachments_check"):
+                        missing = attachments.validate(path for paths in file_paths for path in paths)
+                    if missing:
+                        problems = self._missing_files(todo, file_paths, missing)
+                        kept = [paths for (d, _, _), paths in zip(todo, file_paths) if d.id not in problems]
+                        todo = yield from self._reject(todo, problems, "Missing attachment", journal)
+                        file_paths = kept
+                else:
+                    file_paths = [[m['filepath'] for m in matches] for _, matches, _ in todo]
+
+                with self.stats.timer("render"):
+                    rendered = self.renderer.render_batch([(d, m) for d, m, _ in todo])
+
+                yield from self._send(todo, file_paths, rendered, attachments, journal, job, checkpoint, sleep, total)
+            self.stats.count("attachment_files", len(attachments.by_content))
+        finally:
+            attachments.close()
+            if journal:
+                journal.close()
+
+    @staticmethod
+    def _missing_files(todo, file_paths, missing):
+        """distributor id -> detail, for the items with any of the missing files"""
+        missing = set(missing)
+        problems = {}
+        for (distributor, _, _), paths in zip(todo, file_paths):
+            absent = [os.path.basename(path) for path in paths if path in missing]
+            if absent:
+                problems[distributor.id] = f"Missing attachment: {', '.join(absent)}"
+        return problems
+
+    def _reject(self, todo, problems, error_msg, journal):
+        """Yield a failure for every item in problems and return the rest of todo"""
+        accepted = []
+        for distributor, matches, key in todo:
+            detail = problems.get(distributor.id)
+            if detail is None:
+                accepted.append((distributor, matches, key))
+                continue
+            if journal:
+                journal.record(key, distributor.id, self._month(matches), FAILED, detail)
+            self.stats.count("failed")
+            yield distributor, error_msg, detail
+        return accepted
+
+    def _send(self, todo, file_paths, rendered, attachments, journal, job, checkpoint, sleep, total):
+        retries = []  # heap of (due, seq, attempt, distributor, month, key, paths, message)
+        seq = itertools.count()
+        attachments.hold(file_paths)
+
+        def record(distributor, month, key, paths, error_msg, detail):
+            attachments.done(paths)
+            if journal:
+                with self.stats.timer("journal"):
+                    journal.record(key, distributor.id, month, SENT if error_msg is None else FAILED, detail)
+            self.stats.count("sent" if error_msg is None else "failed")
+            return distributor, error_msg, detail
+
+        def attempt(distributor, month, key, paths, message, attempt_no):
+            """Submit once; returns the final result, or None if the send was queued for a retry"""
+            with self.stats.timer("rate_limit_wait"):
+                self.bucket.acquire(sleep)
+            try:
+                with self.stats.timer("transport_submit"):
+                    self.transport.send(message)
+            except TransportError as e:
+                return record(distributor, month, key, paths, str(e), str(e))
+            except Exception as e:
+                if attempt_no >= self.retry_attempts:
+                    return record(distributor, month, key, paths, str(e), f"{e} (after {attempt_no + 1} attempts)")
+                self.stats.count("retries_scheduled")
+                due = time.monotonic() + self.retry_base_seconds * 2 ** attempt_no
+                heapq.heappush(retries, (due, next(seq), attempt_no + 1, distributor, month, key, paths, message))
+                return None
+            return record(distributor, month, key, paths, None, f"Sent with {len(message.attachments)} attachments")
+
+        with ThreadPoolExecutor(max_workers=self.prepare_workers) as pool:
+            pending = deque()
+            items = iter(zip(todo, file_paths, rendered))
+            done = total - len(todo)
+
+            def fill():
+                while len(pending) < self.prepare_workers * 2:
+                    item = next(items, None)
+                    if item is None:
+                        return
+                    (distributor, matches, key), paths, message = item
+                    pending.append((distributor, self._month(matches), key, paths,
+                                    pool.submit(self._prepare, distributor, paths, attachments, message)))
+
+            fill()
+            while pending or retries:
+                checkpoint()
+                if pending:
+                    distributor, month, key, paths, future = pending.popleft()
+                    fill()
+                    if job:
+                        job.progress(done, total, f"Processing: {distributor.name}")
+                    done += 1
+                    try:
+                        message = future.result()
+                    except PrepareError as e:
+                        yield record(distributor, month, key, paths, e.args[0], e.args[1])
+                    except Exception as e:
+                        yield record(distributor, month, key, paths, str(e), str(e))
+                    else:
+                        result = attempt(distributor, month, key, paths, message, 0)
+                        if result is not None:
+                            yield result
+                elif retries[0][0] > time.monotonic():
+                    # Main batch finished; only retries left, so wait for the next one to fall due
+                    if job:
+                        job.progress(done, total, f"Retrying {len(retries)} failed sends...")
+                    sleep(min(1.0, retries[0][0] - time.monotonic()))
+
+                while retries and retries[0][0] <= time.monotonic():
+                    checkpoint()
+                    _, _, attempt_no, distributor, month, key, paths, message = heapq.heappop(retries)
+                    if job:
+                        job.progress(done, total, f"Retrying: {distributor.name}")
+                    result = attempt(distributor, month, key, paths, message, attempt_no)
+                    if result is not None:
+                        yield result
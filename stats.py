@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+class RunStats:
+    """Stage timers and counters for one matching or sending run.
+
+    timer() accumulates wall time per stage (stages may be timed from several threads at
+    once, e.g. message construction on the prepare pool); count() adds to a counter. Only
+    whole stages and batches are timed, never single comparisons, so the cost is a few
+    perf_counter calls per file or message.
+    """
+
+    enabled = True
+
+    def __init__(self, name, profile_dir=None):
+        self.name = name
+        self.started = time.time()
+        self.started_perf = time.perf_counter()
+        self.elapsed = None
+        self.timers = {}
+        self.counters = {}
+        self.profile_dir = profile_dir
+        self.profile_path = None
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+
+    def count(self, counter, n=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    @contextmanager
+    def profiling(self):
+        """cProfile the calling thread for the duration, if a profile_dir was given"""
+        if not self.profile_dir:
+            yield
+            return
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+            self.profile_path = os.path.join(self.profile_dir, f"{self.name}-{stamp}.prof")
+            profiler.dump_stats(self.profile_path)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started_perf
+        return self
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "run": self.name,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "elapsed": round(self.elapsed, 4) if self.elapsed is not None else None,
+                "timers": {stage: round(seconds, 4) for stage, seconds in self.timers.items()},
+                "counters": dict(self.counters),
+                "profile": self.profile_path,
+            }
+
+    def write(self, path):
+        """Append the run as one JSON line to the structured stats log"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.as_dict()) + "\n")
+
+    def summary(self):
+        """Human-readable lines for the Run stats panel"""
+        data = self.as_dict()
+        lines = [f"{data['run']} run at {data['started']}"
+                 + (f", {data['elapsed']:.2f}s total" if data['elapsed'] is not None else "")]
+        for stage, seconds in sorted(data['timers'].items(), key=lambda item: -item[1]):
+            lines.append(f"  {stage:<24}{seconds:>10.3f}s")
+        for counter, value in sorted(data['counters'].items()):
+            lines.append(f"  {counter:<24}{value:>10}")
+        if data['profile']:
+            lines.append(f"  profile: {data['profile']}")
+        return "\n".join(lines)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullStats:
+    """Stand-in used when instrumentation is off; every call is a no-op"""
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, stage):
+        return self._timer
+
+    def add_time(self, stage, seconds):
+        pass
+
+    def count(self, counter, n=1):
+        pass
+
+    def profiling(self):
+        return self._timer
+
+    def finish(self):
+        return self
+
+    def write(self, path):
+        pass
+
+
+NULL_STATS = NullStats()
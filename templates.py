@@ -0,0 +1,143 @@
+import os
+import re
+import html
+import threading
+
+from lru import LRUCache
+
+# Placeholders usable in the Subject, Body and Regards columns of the distributor list
+PLACEHOLDERS = ("name", "email", "cc", "month", "commission", "files", "file_count")
+_PLACEHOLDER_RE = re.compile(r"\{(" + "|".join(PLACEHOLDERS) + r")\}")
+_DOCUMENT_RE = re.compile(r"^\s*<\s*(!doctype|html)\b", re.IGNORECASE)
+_HTML_RE = re.compile(r"<\s*(html|body|p|div|br|table|span|b|strong|i|em|a)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_BREAK_RE = re.compile(r"<\s*(br|/p|/div|/tr|/h\d)\s*/?>", re.IGNORECASE)
+
+
+class Template:
+    """A subject/body text with its {placeholders} located once.
+
+    Only the names in PLACEHOLDERS are substituted; any other braces are left exactly as
+    written, so existing bodies render unchanged. A body is HTML only if it starts with <html>
+    (or a doctype), or, with html_fragments, if it contains any HTML tag; such a fragment
+    keeps its line breaks as <br>.
+    """
+
+    __slots__ = ('text', 'parts', 'html', 'fragment')
+
+    def __init__(self, text, html_fragments=False):
+        self.text = text
+        document = bool(_DOCUMENT_RE.match(text))
+        self.fragment = not document and html_fragments and bool(_HTML_RE.search(text))
+        self.html = document or self.fragment
+        # re.split alternates literal text and placeholder names
+        pieces = _PLACEHOLDER_RE.split(text)
+        self.parts = tuple((i % 2 == 1, piece) for i, piece in enumerate(pieces) if piece)
+
+    def render(self, values, escape=False):
+        if len(self.parts) == 1 and not self.parts[0][0]:
+            return self.text
+        out = []
+        for is_field, piece in self.parts:
+            if is_field:
+                value = values.get(piece, "")
+                out.append(html.escape(value) if escape else value)
+            else:
+                out.append(piece)
+        return "".join(out)
+
+
+def html_to_text(body):
+    """Plain-text alternative for an HTML body"""
+    text = _TAG_RE.sub("", _BREAK_RE.sub("\n", body))
+    return html.unescape(text).strip()
+
+
+class RenderedMessage:
+    __slots__ = ('subject', 'body', 'html')
+
+    def __init__(self, subject, body, html):
+        self.subject = subject
+        self.body = body
+        self.html = html
+
+
+def template_values(distributor, matches):
+    """Placeholder values for a distributor and its matches (month/commission of the best match)"""
+    best = matches[0] if matches else {}
+    return {
+        "name": distributor.name,
+        "email": distributor.email,
+        "cc": distributor.cc,
+        "month": str(best.get('month', '') or ''),
+        "commission": str(best.get('commission', '') or ''),
+        "files": ", ".join(os.path.basename(m['filepath']) for m in matches),
+        "file_count": str(len(matches)),
+    }
+
+
+class MessageRenderer:
+    """Renders subjects and bodies from compiled templates, caching every rendered message.
+
+    Templates are compiled once per distinct text (most lists share one subject and body),
+    and rendered messages are cached per distributor and match, so the preview pane and the
+    send that follows it render each message only once. Safe to share between the UI and
+    the send worker. html_fragments is passed on to Template (config.HTML_BODIES).
+    """
+
+    def __init__(self, cache_size=4096, html_fragments=False):
+        self.html_fragments = html_fragments
+        self.templates = {}
+        self.rendered = LRUCache(cache_size)
+        self.lock = threading.Lock()
+
+    def template(self, text):
+        template = self.templates.get(text)
+        if template is None:
+            template = self.templates.setdefault(text, Template(text, self.html_fragments))
+        return template
+
+    @staticmethod
+    def _key(distributor, matches):
+        best = matches[0] if matches else {}
+        return (distributor.id, str(best.get('month', '')), str(best.get('commission', '')),
+                tuple(m['filepath'] for m in matches))
+
+    def _render(self, distributor, matches):
+        values = template_values(distributor, matches)
+        body_template = self.template(distributor.body)
+        is_html = body_template.html
+        subject = self.template(distributor.subject).render(values)
+        body = body_template.render(values, escape=is_html)
+        if body_template.fragment:
+            # Written as plain text with a few tags; keep the line breaks the author typed
+            body = body.replace("\r\n", "\n").replace("\n", "<br>\n")
+        regards = self.template(distributor.regards).render(values) if distributor.regards else ""
+        if regards:
+            if is_html:
+                # Regards is plain text in the list, so it is escaped as a whole
+                block = "<p>Regards,<br>" + html.escape(regards).replace("\n", "<br>") + "</p>"
+                close = body.lower().rfind("</body>")
+                body = body[:close] + block + body[close:] if close >= 0 else body + block
+            else:
+                body += f"\n\nRegards,\n{regards}"
+        return RenderedMessage(subject, body, is_html)
+
+    def render(self, distributor, matches=()):
+        key = self._key(distributor, matches)
+        with self.lock:
+            rendered = self.rendered.get(key)
+        if rendered is None:
+            rendered = self._render(distributor, matches)
+            with self.lock:
+                self.rendered.put(key, rendered)
+        return rendered
+
+    def render_batch(self, items):
+        """Render (distributor, matches) items in one pass; returns RenderedMessages in order"""
+        return [self.render(distributor, matches) for distributor, matches in items]
+
+    def clear(self):
+        with self.lock:
+            self.rendered.clear()
+            self.templates.clear()
@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import smtplib
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+import config
+from recipients import split_addresses
+from stats import NULL_STATS
+from templates import html_to_text
+
+
+class TransportError(Exception):
+    pass
+
+
+class Transport:
+    """Submits prepared OutgoingMessages.
+
+    open() and close() bracket a batch and are called on the thread that will call send(),
+    which matters for COM. supports_display tells the UI whether display() can open a
+    message for review instead of sending it.
+    """
+
+    name = "transport"
+    supports_display = False
+    stats = NULL_STATS
+
+    def warm_up(self):
+        """Do the slow part of connecting ahead of time; safe to call from a background thread"""
+        pass
+
+    @property
+    def connected(self):
+        return False
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, message):
+        raise NotImplementedError
+
+    def resolve_addresses(self, addresses):
+        """Check addresses against the mail system before sending; returns the unresolved ones.
+
+        Transports that can only find out by sending report none.
+        """
+        return []
+
+    def display(self, message):
+        raise TransportError(f"{self.name} cannot display messages for review")
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OutlookTransport(Transport):
+    name = "outlook"
+    supports_display = True
+
+    def __init__(self):
+        self.outlook = None
+        self._com_initialized = False
+
+    def warm_up(self):
+        # Launching Outlook takes seconds on a cold start. Doing it in a throwaway apartment
+        # lets open(), which must run on the thread that uses the handle, attach quickly.
+        import pythoncom
+        import win32com.client
+
+        pythoncom.CoInitialize()
+        try:
+            win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+        finally:
+            pythoncom.CoUninitialize()
+
+    @property
+    def connected(self):
+        return self.outlook is not None
+
+    def open(self):
+        import pythoncom
+        import win32com.client  # For Outlook integration
+
+        # COM objects can't cross threads, so every batch gets its own apartment and Outlook handle
+        pythoncom.CoInitialize()
+        self._com_initialized = True
+        self.outlook = win32com.client.Dispatch("Outlook.Application")
+
+    def close(self):
+        self.outlook = None
+        if self._com_initialized:
+            import pythoncom
+            pythoncom.CoUninitialize()
+            self._com_initialized = False
+
+    def _build(self, message):
+        mail = self.outlook.CreateItem(0)
+        mail.To = message.to
+        if message.cc:
+            mail.CC = message.cc
+        mail.Subject = message.subject
+        if message.html:
+            mail.HTMLBody = message.body
+        else:
+            mail.Body = message.body
+        for attachment in message.attachments:
+            mail.Attachments.Add(attachment.path)
+
+        unresolved = []
+        with self.stats.timer("resolve_recipients"):
+            try:
+                mail.Recipients.ResolveAll()
+                unresolved = [r.Name for r in mail.Recipients if not r.Resolved]
+            except Exception:
+                unresolved = [r.Name for r in mail.Recipients]
+
+        if unresolved:
+            raise TransportError(f"Unresolved recipients: {', '.join(unresolved)}")
+        return mail
+
+    def resolve_addresses(self, addresses):
+        # One address book session for the whole batch instead of one ResolveAll per mail item
+        session = self.outlook.Session
+        unresolved = []
+        for address in addresses:
+            try:
+                if not session.CreateRecipient(address).Resolve():
+                    unresolved.append(address)
+            except Exception:
+                unresolved.append(address)
+        return unresolved
+
+    def send(self, message):
+        self._build(message).Send()
+
+    def display(self, message):
+        self._build(message).Display(True)
+
+
+def build_mime(message, sender):
+    """Render an OutgoingMessage as an RFC 5322 message with its attachments.
+
+    Attachment parts are shared with every other message of the batch carrying the same file.
+    HTML bodies go out as multipart/alternative with a plain-text version first.
+    """
+    mime = EmailMessage()
+    mime['From'] = sender
+    mime['To'] = ", ".join(split_addresses(message.to))
+    if message.cc:
+        mime['Cc'] = ", ".join(split_addresses(message.cc))
+    mime['Subject'] = message.subject
+    mime['Date'] = formatdate(localtime=True)
+    mime['Message-ID'] = make_msgid()
+    if message.html:
+        mime.set_content(html_to_text(message.body))
+        mime.add_alternative(message.body, subtype='html')
+    else:
+        mime.set_content(message.body)
+
+    if message.attachments:
+        mime.make_mixed()
+        for attachment in message.attachments:
+            mime.attach(attachment.mime_part())
+    return mime
+
+
+class SMTPTransport(Transport):
+    """Sends over one SMTP session for the whole batch.
+
+    The connection is opened once and reused for every message, reconnecting transparently
+    if the server drops it and after max_per_session messages (many servers cap this).
+    Pointing it at a local debugging server (e.g. aiosmtpd on localhost:1025) gives a
+    network-realistic run without delivering anything.
+    """
+
+    name = "smtp"
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False,
+                 use_ssl=False, sender=None, timeout=60, max_per_session=100):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.sender = sender or username
+        self.timeout = timeout
+        self.max_per_session = max_per_session
+        self.server = None
+        self.sent_in_session = 0
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.starttls:
+            server.starttls()
+            server.ehlo()
+        if self.username:
+            server.login(self.username, self.password or "")
+        self.server = server
+        self.sent_in_session = 0
+
+    def open(self):
+        if not self.sender:
+            raise TransportError("SMTP sender address is not configured")
+        self._connect()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+    def send(self, message):
+        if self.server is None or self.sent_in_session >= self.max_per_session:
+            self.close()
+            self._connect()
+
+        with self.stats.timer("build_mime"):
+            mime = build_mime(message, self.sender)
+        try:
+            refused = self.server.send_message(mime)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            refused = self.server.send_message(mime)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise TransportError(f"Unresolved recipients: {', '.join(e.recipients)}")
+        self.sent_in_session += 1
+
+        if refused:
+            raise TransportError(f"Unresolved recipients: {', '.join(refused)}")
+
+
+class EmlTransport(Transport):
+    """Writes each message as an .eml file instead of sending it (for dry runs and load tests)"""
+
+    name = "eml"
+
+    def __init__(self, directory, sender=None):
+        self.directory = directory
+        self.sender = sender or "noreply@localhost"
+        self.written = []
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def send(self, message):
+        safe_name = re.sub(r"[^\w.-]+", "_", message.distributor_name or "message").strip("_")[:60]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{stamp}_{safe_name}.eml")
+        counter = 1
+        while os.path.exists(path):
+            counter += 1
+            path = os.path.join(self.directory, f"{stamp}_{safe_name}_{counter}.eml")
+        with self.stats.timer("build_mime"):
+            data = build_mime(message, self.sender).as_bytes()
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.written.append(path)
+
+
+def create_transport(name=None):
+    """Build the transport selected by config.MAIL_TRANSPORT (or name)"""
+    name = (name or config.MAIL_TRANSPORT).lower()
+    if name == "outlook":
+        return OutlookTransport()
+    if name == "smtp":
+        return SMTPTransport(config.SMTP_HOST, config.SMTP_PORT, config.SMTP_USERNAME, config.SMTP_PASSWORD,
+                             starttls=config.SMTP_STARTTLS, use_ssl=config.SMTP_SSL, sender=config.SMTP_SENDER,
+                             max_per_session=config.SMTP_MAX_PER_SESSION)
+    if name == "eml":
+        return EmlTransport(config.EML_OUTPUT_DIR, config.SMTP_SENDER)
+    raise TransportError(f"Unknown mail transport: {name}")